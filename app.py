@@ -1,13 +1,22 @@
 import streamlit as st
 import pandas as pd
-import googlemaps
 import time
-import os
-import json
-import matplotlib.pyplot as plt
+import io
 from PIL import Image
 from authlib.integrations.requests_client import OAuth2Session
 from streamlit_cookies_manager import EncryptedCookieManager
+from cache import open_geocode_cache, open_route_cache
+from fetcher import ApiFetcher, make_client
+from prefilter import DEFAULT_CANDIDATES
+from ingest import read_postcode_groups
+from postcode_index import open_postcode_index
+from planner import generate_recommendations, plan_venues, rank_recommendations
+from scoring import rank_venues
+from optimizer import CONSTRAINT_HARD, CONSTRAINT_NONE, CONSTRAINT_SOFT, optimize_venues
+from jobs import JobManager, input_key
+from metrics import MetricsStore, RunMetrics
+from charts import render_budget_charts
+from departure import DEFAULT_WEEKDAY, EVENT_TIMEZONE, TIME_WINDOW_MINUTES, WEEKDAYS, parse_start_time, travel_window
 
 # Configuration for the app
 st.set_page_config(page_title="Event Location Planner")
@@ -48,10 +57,26 @@ def load_settings():
     settings['cost_per_km_train'] = cookies.get('cost_per_km_train')
     settings['emission_per_km_train'] = cookies.get('emission_per_km_train')
     settings['base_locations'] = cookies.get('base_locations')
+    settings['prefilter_k'] = cookies.get('prefilter_k')
+    settings['ranking_mode'] = cookies.get('ranking_mode')
+    settings['budget_constraint'] = cookies.get('budget_constraint')
+    settings['weight_cost'] = cookies.get('weight_cost')
+    settings['weight_emissions'] = cookies.get('weight_emissions')
+    settings['weight_time'] = cookies.get('weight_time')
+    settings['num_venues'] = cookies.get('num_venues')
+    settings['venue_objective'] = cookies.get('venue_objective')
+    settings['combined_charts'] = cookies.get('combined_charts')
+    settings['timed_routing'] = cookies.get('timed_routing')
+    settings['event_weekday'] = cookies.get('event_weekday')
+    settings['event_start'] = cookies.get('event_start')
     return settings
 
-# Function to save settings to cookies
+# Function to save settings to cookies; skipped when nothing changed since the last save in this session,
+# since the page reruns every second while a job is running
 def save_settings(settings):
+    if st.session_state.get('saved_settings') == settings:
+        return
+    st.session_state['saved_settings'] = dict(settings)
     cookies.set('api_key', settings['api_key'])
     cookies.set('budget_type', settings['budget_type'])
     cookies.set('budget_cost', str(settings['budget_cost']))
@@ -62,6 +87,18 @@ def save_settings(settings):
     cookies.set('cost_per_km_train', str(settings['cost_per_km_train']))
     cookies.set('emission_per_km_train', str(settings['emission_per_km_train']))
     cookies.set('base_locations', settings['base_locations'])
+    cookies.set('prefilter_k', str(settings['prefilter_k']))
+    cookies.set('ranking_mode', settings['ranking_mode'])
+    cookies.set('budget_constraint', settings['budget_constraint'])
+    cookies.set('weight_cost', str(settings['weight_cost']))
+    cookies.set('weight_emissions', str(settings['weight_emissions']))
+    cookies.set('weight_time', str(settings['weight_time']))
+    cookies.set('num_venues', str(settings['num_venues']))
+    cookies.set('venue_objective', settings['venue_objective'])
+    cookies.set('combined_charts', str(settings['combined_charts']))
+    cookies.set('timed_routing', str(settings['timed_routing']))
+    cookies.set('event_weekday', settings['event_weekday'])
+    cookies.set('event_start', settings['event_start'].strftime('%H:%M'))
 
 # Check if user wants to log out
 if st.sidebar.button("Log Off"):
@@ -75,6 +112,20 @@ if st.sidebar.button("Log Off"):
     cookies.delete('cost_per_km_train')
     cookies.delete('emission_per_km_train')
     cookies.delete('base_locations')
+    cookies.delete('prefilter_k')
+    cookies.delete('ranking_mode')
+    cookies.delete('budget_constraint')
+    cookies.delete('weight_cost')
+    cookies.delete('weight_emissions')
+    cookies.delete('weight_time')
+    cookies.delete('num_venues')
+    cookies.delete('venue_objective')
+    cookies.delete('combined_charts')
+    cookies.delete('timed_routing')
+    cookies.delete('event_weekday')
+    cookies.delete('event_start')
+    st.session_state.pop('saved_settings', None)
+    st.session_state.pop('user_info', None)
     st.experimental_rerun()
 
 # After redirect back from Google
@@ -88,8 +139,11 @@ if 'token' not in st.session_state and 'code' in query_params:
 
 # If logged in
 if 'token' in st.session_state:
-    oauth = OAuth2Session(client_id, client_secret, token=st.session_state['token'])
-    user_info = oauth.get(userinfo_url).json()
+    # Fetch the user's profile once per session rather than on every rerun
+    if 'user_info' not in st.session_state:
+        oauth = OAuth2Session(client_id, client_secret, token=st.session_state['token'])
+        st.session_state['user_info'] = oauth.get(userinfo_url).json()
+    user_info = st.session_state['user_info']
     st.success(f"Welcome {user_info['name']}!")
 
     st.subheader("Plan your events efficiently with optimal locations 🌍🎉")
@@ -116,6 +170,7 @@ if 'token' in st.session_state:
         budget_cost = st.sidebar.number_input("Average Budget for Costs per Attendee (£)", value=float(settings.get('budget_cost', 100)))
         budget_time = st.sidebar.number_input("Average Budget for Time per Attendee (minutes)", value=float(settings.get('budget_time', 15)))
         budget_emissions = st.sidebar.number_input("Average Budget for Emissions per Attendee (kg CO2)", value=float(settings.get('budget_emissions', 20)))
+    combined_charts = st.sidebar.checkbox("Combine budget charts into one figure", value=settings.get('combined_charts') == 'True')
 
     # Cost and Emissions Lookup Table for Different Travel Modes
     st.sidebar.subheader("💡 Cost and Emissions Lookup Table")
@@ -127,6 +182,35 @@ if 'token' in st.session_state:
     # Potential Base Locations Input
     st.sidebar.subheader("📍 Potential Base Locations")
     base_locations = st.sidebar.text_area("Enter base locations (one per line)", value=settings.get('base_locations', ''))
+    prefilter_k = st.sidebar.number_input("Candidate venues to route (K)", min_value=1, step=1, value=int(settings.get('prefilter_k') or DEFAULT_CANDIDATES), help="Candidates are ranked by straight-line distance first; only the best K (plus those nearest the attendees' median point) are routed with Google Maps.")
+
+    # Ranking of the evaluated venues; changing these re-ranks the last run without fetching anything
+    st.sidebar.subheader("🏆 Ranking")
+    ranking_modes = {"Lowest cost, then emissions": None, "Weighted (Pareto optimal first)": 'weighted'}
+    ranking_mode = st.sidebar.radio("Rank locations by", list(ranking_modes), index=list(ranking_modes).index(settings.get('ranking_mode') or "Lowest cost, then emissions"))
+    budget_constraints = {"Ignore": CONSTRAINT_NONE, "Soft (penalize overshoot)": CONSTRAINT_SOFT, "Hard (exclude over budget)": CONSTRAINT_HARD}
+    budget_constraint = st.sidebar.radio("Budgets", list(budget_constraints), index=list(budget_constraints).index(settings.get('budget_constraint') or "Ignore"))
+    if ranking_modes[ranking_mode] == 'weighted':
+        weight_cost = st.sidebar.slider("Weight of Cost", 0.0, 1.0, float(settings.get('weight_cost') or 1.0), 0.05)
+        weight_emissions = st.sidebar.slider("Weight of Emissions", 0.0, 1.0, float(settings.get('weight_emissions') or 1.0), 0.05)
+        weight_time = st.sidebar.slider("Weight of Time", 0.0, 1.0, float(settings.get('weight_time') or 1.0), 0.05)
+    else:
+        weight_cost = float(settings.get('weight_cost') or 1.0)
+        weight_emissions = float(settings.get('weight_emissions') or 1.0)
+        weight_time = float(settings.get('weight_time') or 1.0)
+
+    # Regional sessions: split the event over several venues, each attendee going to their cheapest one
+    st.sidebar.subheader("🗺️ Regional Sessions")
+    num_venues = st.sidebar.number_input("Number of venues", min_value=1, step=1, value=int(settings.get('num_venues') or 1), help="With more than one venue, the planner picks that many locations together and assigns every attendee to one of them.")
+    venue_objectives = {"Cost": 'cost', "Emissions": 'emissions', "Time": 'time'}
+    venue_objective = st.sidebar.selectbox("Assign attendees by lowest", list(venue_objectives), index=list(venue_objectives).index(settings.get('venue_objective') or "Cost"))
+
+    # Event start: routes are timed for a typical weekday at the start time, bucketed so they can be cached and shared
+    st.sidebar.subheader("🕘 Event Start")
+    timed_routing = st.sidebar.checkbox("Route for the event start time", value=settings.get('timed_routing') == 'True', help=f"Transit routes arrive by the start and car routes use typical traffic. Start times are grouped into {TIME_WINDOW_MINUTES}-minute windows so routes can be reused.")
+    event_weekday = st.sidebar.selectbox("Typical weekday", WEEKDAYS, index=WEEKDAYS.index(settings.get('event_weekday') or DEFAULT_WEEKDAY), disabled=not timed_routing)
+    event_start = st.sidebar.time_input("Event start time", value=parse_start_time(settings.get('event_start') or '09:00'), disabled=not timed_routing, help=f"Local time in {EVENT_TIMEZONE.key}.")
+    event_window = travel_window(event_weekday, event_start) if timed_routing else None
 
     # Save settings to cookies
     save_settings({
@@ -139,147 +223,77 @@ if 'token' in st.session_state:
         'emission_per_km_car': emission_per_km_car,
         'cost_per_km_train': cost_per_km_train,
         'emission_per_km_train': emission_per_km_train,
-        'base_locations': base_locations
+        'base_locations': base_locations,
+        'prefilter_k': prefilter_k,
+        'ranking_mode': ranking_mode,
+        'budget_constraint': budget_constraint,
+        'weight_cost': weight_cost,
+        'weight_emissions': weight_emissions,
+        'weight_time': weight_time,
+        'num_venues': num_venues,
+        'venue_objective': venue_objective,
+        'combined_charts': combined_charts,
+        'timed_routing': timed_routing,
+        'event_weekday': event_weekday,
+        'event_start': event_start
     })
 
     # Upload Attendee Postcodes
     st.subheader("Upload Attendee Postcodes CSV")
     uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
 
+    # Function to stream and group an upload once per file content, instead of on every rerun
+    @st.cache_data
+    def load_attendees(file_bytes):
+        start = time.perf_counter()
+        attendees = read_postcode_groups(io.BytesIO(file_bytes))
+        attendees['parse_seconds'] = time.perf_counter() - start
+        return attendees
+
     if uploaded_file:
-        df = pd.read_csv(uploaded_file)
-        if 'postcode' not in df.columns:
+        attendees = load_attendees(uploaded_file.getvalue())
+        if not attendees['has_postcode']:
             st.error("The uploaded CSV file must contain a 'postcode' column.")
         else:
-            st.write("Attendee Postcodes:", df)
-
-    # Function to validate and format locations
-    def validate_location(api_key, location):
-        gmaps = googlemaps.Client(key=api_key)
-        try:
-            result = gmaps.geocode(location)
-            if result:
-                formatted_address = result[0]['formatted_address']
-                lat_lng = result[0]['geometry']['location']
-                return formatted_address, lat_lng
-            else:
-                return None, None
-        except Exception as e:
-            st.error(f"Error validating location {location}: {e}")
-            return None, None
-
-    # Function to calculate distances using Google Routes API
-    def calculate_distances(api_key, origins, destinations, travel_mode):
-        gmaps = googlemaps.Client(key=api_key)
-        distances = {}
-        times = {}
-        for origin in origins:
-            distances[origin] = {}
-            times[origin] = {}
-            for destination in destinations:
-                try:
-                    result = gmaps.directions(origin, destination, mode=travel_mode)
-                    if result and result[0]['legs']:
-                        distance = result[0]['legs'][0]['distance']['value'] / 1000  # in km
-                        time = result[0]['legs'][0]['duration']['value'] / 60  # in minutes
-                        distances[origin][destination] = distance
-                        times[origin][destination] = time
-                    else:
-                        distances[origin][destination] = float('inf')
-                        times[origin][destination] = float('inf')
-                except Exception as e:
-                    st.error(f"Error calculating distance from {origin} to {destination} with mode {travel_mode}: {e}")
-                    distances[origin][destination] = float('inf')
-                    times[origin][destination] = float('inf')
-        return distances, times
-
-    # Function to choose travel mode based on conditions
-    def choose_travel_mode(api_key, origin, destination, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train):
-        car_distances, car_times = calculate_distances(api_key, [origin], [destination], 'driving')
-        train_distances, train_times = calculate_distances(api_key, [origin], [destination], 'transit')
-        
-        car_time = car_times[origin][destination]
-        train_time = train_times[origin][destination]
-
-        if car_time == float('inf') and train_time == float('inf'):
-            return 'transit'  # Default to train if both are unavailable
-        if car_time == float('inf'):
-            return 'transit'
-        if train_time == float('inf'):
-            return 'driving'
-        if train_time > 1.5 * car_time:
-            return 'driving'
-        return 'transit'
-
-    # Function to generate recommendations
-    def generate_recommendations(df, base_locations, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, budget_cost, budget_time, budget_emissions, budget_type):
-        origins = df['postcode'].tolist()
-        valid_origins = [validate_location(api_key, origin)[0] for origin in origins]
-        valid_origins = [origin for origin in valid_origins if origin is not None]
-        num_attendees = len(valid_origins)
-        
-        if not base_locations.strip():
-            # If no base locations provided, use attendee locations as potential base locations
-            destinations = valid_origins
-        else:
-            destinations = base_locations.split('\n')
-        
-        valid_destinations = [validate_location(api_key, destination)[0] for destination in destinations]
-        valid_destinations = [destination for destination in valid_destinations if destination is not None]
-        
-        results = []
-        lat_lng_mapping = {}
-        for location in valid_destinations:
-            total_cost = 0
-            total_emissions = 0
-            total_time = 0
-            for origin in valid_origins:
-                travel_mode = choose_travel_mode(api_key, origin, location, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train)
-                if travel_mode == 'driving':
-                    cost_per_km = cost_per_km_car
-                    emission_per_km = emission_per_km_car
-                else:
-                    cost_per_km = cost_per_km_train
-                    emission_per_km = emission_per_km_train
-                
-                distances, times = calculate_distances(api_key, [origin], [location], travel_mode)
-                distance = distances[origin][location]
-                time = times[origin][location]
-                
-                if distance == float('inf') or time == float('inf'):
-                    st.error(f"Error calculating distance or time for origin {origin} to destination {location} with mode {travel_mode}")
-                    continue
-
-                total_cost += distance * cost_per_km
-                total_emissions += distance * emission_per_km
-                total_time += time
-            
-            if num_attendees == 0:
-                avg_cost_per_attendee = 0
-                avg_emissions_per_attendee = 0
-                avg_time_per_attendee = 0
-            else:
-                avg_cost_per_attendee = total_cost / num_attendees
-                avg_emissions_per_attendee = total_emissions / num_attendees
-                avg_time_per_attendee = total_time / num_attendees
-            
-            total_time_hours, total_time_minutes = divmod(total_time, 60)
-            
-            lat_lng_mapping[location.split(",")[0]] = validate_location(api_key, location)[1]
-            
-            results.append({
-                "Location": location.split(",")[0],  # Extracting city name
-                "Total Cost (£)": int(total_cost),
-                "Total Emissions (kg CO2)": int(total_emissions),
-                "Total Time": f"{int(total_time_hours)}h {int(total_time_minutes)}m",
-                "Avg Cost per Attendee (£)": int(avg_cost_per_attendee),
-                "Avg Emissions per Attendee (kg CO2)": int(avg_emissions_per_attendee),
-                "Avg Time per Attendee": f"{int(avg_time_per_attendee // 60)}h {int(avg_time_per_attendee % 60)}m"
-            })
-        
-        results = sorted(results, key=lambda x: (x["Total Cost (£)"], x["Total Emissions (kg CO2)"]))
-        best_emission_location = min(results, key=lambda x: x["Total Emissions (kg CO2)"])
-        return results[:3], num_attendees, best_emission_location, lat_lng_mapping
+            st.write(f"Attendee Postcodes (first {len(attendees['preview'])} rows):", attendees['preview'])
+            st.markdown(f"**{attendees['total_rows']} rows**, **{len(attendees['groups'])} unique postcodes**, {attendees['blank_rows']} rows without a postcode")
+            st.write("Most common postcodes:", attendees['groups'].head(5))
+
+    # Shared geocode cache, opened once per server process and reused across reruns and sessions
+    @st.cache_resource
+    def get_geocode_cache():
+        return open_geocode_cache()
+
+    # Shared route cache of (origin, destination, travel mode) results, reused by every planner on this server
+    @st.cache_resource
+    def get_route_cache():
+        return open_route_cache()
+
+    # Offline postcode centroid index, if one has been built (see postcode_index.py)
+    @st.cache_resource
+    def get_postcode_index():
+        return open_postcode_index()
+
+    # Shared fetcher per API key: one client/connection pool, rate limited and retried across all sessions
+    @st.cache_resource
+    def get_fetcher(api_key):
+        return ApiFetcher(make_client(api_key))
+
+    # Shared, concurrency-safe store of per-run stage metrics (also the source of the usage statistics)
+    @st.cache_resource
+    def get_metrics_store():
+        return MetricsStore()
+
+    # Shared background job runner, so runs survive reruns and are memoized across sessions; it records
+    # the stage metrics of every run it executes in the metrics store
+    @st.cache_resource
+    def get_job_manager():
+        return JobManager(metrics_store=get_metrics_store())
+
+    # Chart PNGs memoized on the chart data and budgets, so reruns after unrelated widget changes reuse them
+    @st.cache_data(max_entries=64)
+    def cached_budget_charts(locations, charts, combined):
+        return render_budget_charts(locations, charts, combined)
 
     def display_recommendations_and_charts(recommendations, num_attendees, budget_cost, budget_time, budget_emissions, budget_type, best_emission_location, lat_lng_mapping):
         df_recommendations = pd.DataFrame(recommendations)
@@ -290,55 +304,28 @@ if 'token' in st.session_state:
             axis=1
         )
         
-        st.dataframe(df_recommendations)
+        st.dataframe(df_recommendations.drop(columns=["Total Time (min)", "Avg Time per Attendee (min)"]))
 
         # Additional details about the number of attendees
         st.markdown(f"**Number of Attendees Processed: {num_attendees}**")
         st.markdown("This number reflects the total attendees considered to provide these location recommendations based on the provided postcodes.")
 
-        # Create charts
-        locations = [rec['Location'].replace(" 🌿", "") for rec in recommendations]
+        # Create charts from the numeric result columns; the PNGs are cached, so reruns skip rendering
+        locations = [rec['Location'] for rec in recommendations]
         if budget_type == "Total Budget for the Event":
-            costs = [rec['Total Cost (£)'] for rec in recommendations]
-            emissions = [rec['Total Emissions (kg CO2)'] for rec in recommendations]
-            times = [int(rec['Total Time'].split('h')[0]) * 60 + int(rec['Total Time'].split('h')[1].replace('m', '')) for rec in recommendations]
-            budget_cost_label = "Total Cost (£)"
-            budget_time_label = "Total Time (minutes)"
-            budget_emissions_label = "Total Emissions (kg CO2)"
+            charts = [
+                ("Total Cost (£)", [rec['Total Cost (£)'] for rec in recommendations], budget_cost),
+                ("Total Emissions (kg CO2)", [rec['Total Emissions (kg CO2)'] for rec in recommendations], budget_emissions),
+                ("Total Time (minutes)", [rec['Total Time (min)'] for rec in recommendations], budget_time),
+            ]
         else:
-            costs = [rec['Avg Cost per Attendee (£)'] for rec in recommendations]
-            emissions = [rec['Avg Emissions per Attendee (kg CO2)'] for rec in recommendations]
-            times = [int(rec['Avg Time per Attendee'].split('h')[0]) * 60 + int(rec['Avg Time per Attendee'].split('h')[1].replace('m', '')) for rec in recommendations]
-            budget_cost_label = "Avg Cost per Attendee (£)"
-            budget_time_label = "Avg Time per Attendee (minutes)"
-            budget_emissions_label = "Avg Emissions per Attendee (kg CO2)"
-        
-        fig, ax = plt.subplots()
-        ax.bar(locations, costs, color='skyblue', label=budget_cost_label)
-        ax.axhline(y=budget_cost, color='red', linestyle='--', label=f'Budgeted {budget_cost_label}')
-        ax.set_ylabel(budget_cost_label)
-        ax.set_title(f'{budget_cost_label} vs Budget')
-        ax.legend()
-        fig.tight_layout()
-        st.pyplot(fig)
-
-        fig, ax = plt.subplots()
-        ax.bar(locations, emissions, color='lightgreen', label=budget_emissions_label)
-        ax.axhline(y=budget_emissions, color='red', linestyle='--', label=f'Budgeted {budget_emissions_label}')
-        ax.set_ylabel(budget_emissions_label)
-        ax.set_title(f'{budget_emissions_label} vs Budget')
-        ax.legend()
-        fig.tight_layout()
-        st.pyplot(fig)
-
-        fig, ax = plt.subplots()
-        ax.bar(locations, times, color='lightcoral', label=budget_time_label)
-        ax.axhline(y=budget_time, color='red', linestyle='--', label=f'Budgeted {budget_time_label}')
-        ax.set_ylabel(budget_time_label)
-        ax.set_title(f'{budget_time_label} vs Budget')
-        ax.legend()
-        fig.tight_layout()
-        st.pyplot(fig)
+            charts = [
+                ("Avg Cost per Attendee (£)", [rec['Avg Cost per Attendee (£)'] for rec in recommendations], budget_cost),
+                ("Avg Emissions per Attendee (kg CO2)", [rec['Avg Emissions per Attendee (kg CO2)'] for rec in recommendations], budget_emissions),
+                ("Avg Time per Attendee (minutes)", [rec['Avg Time per Attendee (min)'] for rec in recommendations], budget_time),
+            ]
+        for image in cached_budget_charts(locations, charts, combined_charts):
+            st.image(image)
 
         # Adding booking buttons
         st.subheader("Booking Links")
@@ -352,12 +339,14 @@ if 'token' in st.session_state:
         st.subheader("Summary of Recommendations Calculation")
         st.markdown("""
         ### How Recommendations are Calculated:
-        1. **Validation of Locations**: All input locations (attendee postcodes and potential event locations) are validated using the Google Maps API to ensure they are correctly formatted and can be geocoded.
-        2. **Distance and Time Calculation**: The Google Maps API is used to calculate the travel distances and times between each attendee's postcode and each potential event location. Both car and train travel modes are considered.
-        3. **Travel Mode Selection**: The default travel mode is train. If the train travel time is more than 1.5 times the car travel time, car travel is selected instead.
-        4. **Cost and Emissions Calculation**: Based on the selected travel mode, the total travel cost and emissions are calculated using the provided cost and emissions per km values. Average costs and emissions per attendee are also calculated.
-        5. **Recommendation Ranking**: The potential event locations are ranked based on total cost and emissions, with the top three locations being recommended.
-        6. **No Base Locations Provided**: If no potential base locations are provided, the tool uses the attendee locations as potential base locations and recommends the best location based on the same criteria.
+        1. **Validation of Locations**: All input locations (attendee postcodes and potential event locations) are validated using the Google Maps API to ensure they are correctly formatted and can be geocoded. Attendees sharing a postcode are grouped, so each unique postcode is geocoded and routed once and weighted by its number of attendees.
+        2. **Candidate Prefiltering**: When there are more candidate locations than the configured K, they are first ranked by an approximate cost and emissions estimate from straight-line distances. Only the best K, plus the few closest to the attendees' median point, are routed with Google Maps.
+        3. **Distance and Time Calculation**: The Google Maps API is used to calculate the travel distances and times between each attendee's postcode and each potential event location. Both car and train travel modes are considered. With an event start time, train routes arrive by the start of its time window on a typical weekday and car routes depart ahead of it in typical traffic; results are shared by all events in the same window.
+        4. **Travel Mode Selection**: The default travel mode is train. If the train travel time is more than 1.5 times the car travel time, car travel is selected instead.
+        5. **Cost and Emissions Calculation**: Based on the selected travel mode, the total travel cost and emissions are calculated using the provided cost and emissions per km values. Average costs and emissions per attendee are also calculated.
+        6. **Recommendation Ranking**: The potential event locations are ranked based on total cost and emissions, with the top three locations being recommended. Alternatively, the Ranking settings list the Pareto-optimal locations (no other location is at least as good on every measure and better on one) first, each group ordered by a weighted score of cost, emissions and time, and treat the budgets as soft (overshoot is penalized) or hard (over-budget locations are excluded) constraints.
+        7. **Regional Sessions**: With more than one venue, the locations are chosen together as a facility location problem: an approximate solution from straight-line distances narrows down the candidates to route, then a greedy choice refined by venue swaps picks the set of locations with the lowest total for the selected measure, each attendee going to their cheapest location.
+        8. **No Base Locations Provided**: If no potential base locations are provided, the tool uses the attendee locations as potential base locations and recommends the best location based on the same criteria.
 
         ### Assumptions Made:
         - **Travel Mode**: Train is the default travel mode. Car travel is considered only if it significantly reduces travel time (less than 1.5 times the train travel time).
@@ -368,53 +357,151 @@ if 'token' in st.session_state:
         These recommendations are intended to provide an optimized selection of event locations based on travel costs, emissions, and times. Please adjust the input values and consider other factors as needed for your specific event planning needs.
         """)
 
-    # Initialize the usage count file
-    usage_count_file = "usage_count.json"
+    # Function to display a k-venue plan: one row per venue with the attendees assigned to it, and the assignments
+    def display_venue_plan(venue_plans, assignments, lat_lng_mapping):
+        st.subheader(f"{len(venue_plans)} Recommended Regional Locations")
+        df_plans = pd.DataFrame(venue_plans)
+        df_plans.index = df_plans.index + 1
+        st.dataframe(df_plans.drop(columns=["Total Time (min)", "Avg Time per Attendee (min)"]))
+        st.markdown(f"**Number of Attendees Processed: {int(assignments['attendee_count'].sum())}**")
+        st.markdown("Each attendee is assigned to the recommended location that is cheapest for them on the selected measure; totals and averages are over the attendees assigned to each location.")
 
-    # Function to load usage data
-    def load_usage_data():
-        if os.path.exists(usage_count_file):
-            with open(usage_count_file, "r") as (f):
-                return json.load(f)
-        else:
-            return {"usage_count": 0, "total_attendees": 0, "total_time": 0, "last_processing_time": 0}
+        with st.expander("👥 Attendee assignments"):
+            st.dataframe(assignments)
+            st.download_button("Download assignments (CSV)", assignments.to_csv(index=False), file_name="venue_assignments.csv", mime="text/csv")
 
-    # Function to save usage data
-    def save_usage_data(data):
-        with open(usage_count_file, "w") as (f):
-            json.dump(data, f)
+        st.subheader("Booking Links")
+        for plan in venue_plans:
+            location = plan['Location']
+            lat_lng = lat_lng_mapping[location]
+            booking_url = f"https://booking.meetingpackage.com/wlsearch?query={location},%20UK&delegates={plan['Attendees']}&duration=8&index_id=venues_index&pt={lat_lng['lat']},{lat_lng['lng']}"
+            st.markdown(f"[Book an Event Venue in {location}]({booking_url})")
 
-    # Load current usage data
-    usage_data = load_usage_data()
+    # Seconds between progress refreshes while a job is running
+    JOB_POLL_SECONDS = 1
+
+    job_manager = get_job_manager()
 
     if st.button("Generate Recommendations"):
         if not api_key:
             st.error("Please enter your Google API Key in the settings.")
         elif not uploaded_file:
             st.error("Please upload a CSV file with attendee postcodes.")
-        elif 'postcode' not in df.columns:
+        elif not attendees['has_postcode']:
             st.error("The uploaded CSV file must contain a 'postcode' column.")
+        elif num_venues > 1:
+            job_key = input_key('venues', attendees['groups'], base_locations, num_venues, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, prefilter_k, venue_objectives[venue_objective], event_window and event_window['bucket'])
+            st.session_state['job_venues'] = num_venues
+            st.session_state['job_id'] = job_manager.submit(
+                job_key, plan_venues, get_fetcher(api_key), attendees['groups'], base_locations, num_venues,
+                cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, prefilter_k, venue_objectives[venue_objective],
+                geocode_cache=get_geocode_cache(), route_cache=get_route_cache(), postcode_index=get_postcode_index(),
+                travel_window=event_window, attendees=int(attendees['groups']['attendee_count'].sum())
+            )
         else:
-            start_time = time.time()
+            last_run = st.session_state.get('last_run')
+            job_key = input_key(attendees['groups'], base_locations, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, prefilter_k, event_window and event_window['bucket'])
+            st.session_state['job_venues'] = 1
+            st.session_state['job_id'] = job_manager.submit(
+                job_key, generate_recommendations, get_fetcher(api_key), attendees['groups'], base_locations,
+                cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, prefilter_k,
+                geocode_cache=get_geocode_cache(), route_cache=get_route_cache(), postcode_index=get_postcode_index(),
+                previous_run=last_run if last_run is not None and last_run.complete else None,
+                travel_window=event_window, attendees=int(attendees['groups']['attendee_count'].sum())
+            )
+
+    # Poll the current job on every rerun; widget interactions no longer lose a run in progress
+    job = job_manager.get(st.session_state['job_id']) if 'job_id' in st.session_state else None
+    if job is not None:
+        if not job.finished:
+            progress = job.progress
+            if progress:
+                st.progress(progress['done'] / progress['total'], text=f"{job.stage}: {progress['done']}/{progress['total']} requests ({progress['in_flight']} in flight, {progress['retried']} retries)")
+            else:
+                st.progress(0, text=f"{job.stage or 'Queued'}...")
+            for level, message in list(job.messages):
+                getattr(st, level)(message)
+            if st.button("Cancel"):
+                job_manager.cancel(job.id)
             with st.spinner('Recommendation Engine at work ⏳🚂'):
-                recommendations, num_attendees, best_emission_location, lat_lng_mapping = generate_recommendations(df, base_locations, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, budget_cost, budget_time, budget_emissions, budget_type)
-                time.sleep(2)  # Simulate processing time
-            end_time = time.time()
-            processing_time = end_time - start_time
-            
-            st.subheader("Top 3 Recommended Locations")
-            display_recommendations_and_charts(recommendations, num_attendees, budget_cost, budget_time, budget_emissions, budget_type, best_emission_location, lat_lng_mapping)
-
-            # Update and save usage data
-            usage_data["usage_count"] += 1
-            usage_data["total_attendees"] += num_attendees
-            usage_data["total_time"] += processing_time
-            usage_data["last_processing_time"] = processing_time
-            save_usage_data(usage_data)
+                time.sleep(JOB_POLL_SECONDS)
+            st.experimental_rerun()
+        elif job.status == 'done':
+            for level, message in job.messages:
+                getattr(st, level)(message)
+            if job.memoized:
+                st.caption("These inputs were evaluated recently, so the earlier result was reused.")
+            render_start = time.perf_counter()
+            if st.session_state.get('job_venues', 1) > 1:
+                venue_plans, assignments, lat_lng_mapping = job.result
+                if venue_plans:
+                    display_venue_plan(venue_plans, assignments, lat_lng_mapping)
+            else:
+                recommendations, num_attendees, best_emission_location, lat_lng_mapping, run = job.result
+                if run is not None:
+                    st.session_state['last_run'] = run
+
+                # Nothing to show when no venue could be located; the error is among the messages above
+                if recommendations:
+                    # Re-rank the evaluated venues with the optimizer when budgets or weights are to be taken into account
+                    if run.destinations and (ranking_modes[ranking_mode] == 'weighted' or budget_constraints[budget_constraint] != CONSTRAINT_NONE):
+                        average = budget_type != "Total Budget for the Event"
+                        budgets = (budget_cost, budget_emissions, budget_time)
+                        weights = (weight_cost, weight_emissions, weight_time) if ranking_modes[ranking_mode] == 'weighted' else (1, 0, 0)
+                        constraint = budget_constraints[budget_constraint]
+                        order, details = optimize_venues(run.scores, budgets, average, constraint, weights)
+                        if len(order) == 0:
+                            st.warning("No location is within all budgets; showing the locations closest to the budgets instead.")
+                            constraint = CONSTRAINT_SOFT
+                            order, details = optimize_venues(run.scores, budgets, average, constraint, weights)
+                        if ranking_modes[ranking_mode] != 'weighted' and constraint == CONSTRAINT_HARD:
+                            # Keep the default cost-then-emissions order among the venues within the budgets
+                            eligible = set(order)
+                            order = [j for j in rank_venues(run.scores) if j in eligible]
+                        # Otherwise the optimizer's order applies: its score is the normalized cost alone in the default
+                        # mode, plus a penalty growing with the overshoot under soft budgets
+                        recommendations, best_emission_location, lat_lng_mapping = rank_recommendations(run, order)
+
+                        with st.expander("🏆 Pareto-optimal locations"):
+                            st.markdown("No other location is at least as good on cost, emissions and time and strictly better on one of them.")
+                            pareto = details[details['pareto_optimal']].sort_values('weighted_score')
+                            st.table(pd.DataFrame({
+                                'Location': [run.destinations[j].split(",")[0] for j in pareto.index],
+                                'Total Cost (£)': [round(run.scores['total_cost'].iloc[j], 2) for j in pareto.index],
+                                'Total Emissions (kg CO2)': [round(run.scores['total_emissions'].iloc[j], 2) for j in pareto.index],
+                                'Total Time (min)': [round(run.scores['total_time'].iloc[j], 1) for j in pareto.index],
+                                'Within Budget': ['Yes' if within else f"No (+{overshoot:.0%})" for within, overshoot in zip(pareto['within_budget'], pareto['budget_overshoot'])],
+                            }))
+                    st.subheader("Top 3 Recommended Locations")
+                    display_recommendations_and_charts(recommendations, num_attendees, budget_cost, budget_time, budget_emissions, budget_type, best_emission_location, lat_lng_mapping)
+            render_seconds = time.perf_counter() - render_start
+
+            # The pipeline stages are recorded by the job manager once per run; the CSV parse and chart
+            # rendering belong to this page view (the job may be shared with other sessions), so they are
+            # stored as a page view, once per job shown in this session rather than on every rerun
+            page_metrics = RunMetrics()
+            if uploaded_file:
+                page_metrics.record("CSV parse", attendees['parse_seconds'], rows=attendees['total_rows'])
+            page_metrics.record("Chart rendering", render_seconds)
+            if st.session_state.get('page_view_recorded') != job.id:
+                get_metrics_store().append_page_view(page_metrics)
+                st.session_state['page_view_recorded'] = job.id
+
+            with st.expander("⏱️ Performance of this run"):
+                st.markdown(f"**Pipeline total: {job.metrics.total_seconds:.2f}s**" + (" (reused result)" if job.memoized else ""))
+                st.table(pd.DataFrame(job.metrics.rows()))
+                st.markdown("**This page view**")
+                st.table(pd.DataFrame(page_metrics.rows()))
+                st.markdown("**Recent runs (percentiles)**")
+                st.table(pd.DataFrame(get_metrics_store().summary()))
+        elif job.status == 'cancelled':
+            st.warning("The recommendation run was cancelled.")
+        else:
+            st.error(f"The recommendation run failed: {job.error}")
 
     # Display cumulative usage data in the sidebar
-    average_time = usage_data["total_time"] / usage_data["usage_count"] if usage_data["usage_count"] > 0 else 0
-    average_time_formatted = time.strftime("%M:%S", time.gmtime(average_time))
+    usage_data = get_metrics_store().usage()
+    average_time_formatted = time.strftime("%M:%S", time.gmtime(usage_data["average_time"]))
     last_processing_time_formatted = time.strftime("%M:%S", time.gmtime(usage_data["last_processing_time"]))
 
     st.sidebar.markdown("---")
@@ -423,6 +510,14 @@ if 'token' in st.session_state:
     st.sidebar.markdown(f"**Total Attendees Processed:** {usage_data['total_attendees']}")
     st.sidebar.markdown(f"**Average Processing Time:** {average_time_formatted} minutes")
     st.sidebar.markdown(f"**Last Processing Time:** {last_processing_time_formatted} minutes")
+    geocode_stats = get_geocode_cache().stats()
+    st.sidebar.markdown(f"**Geocode Cache:** {geocode_stats['hits']} hits / {geocode_stats['misses']} misses ({geocode_stats['hit_rate']:.0%})")
+    postcode_index = get_postcode_index()
+    if postcode_index is not None:
+        index_stats = postcode_index.stats()
+        st.sidebar.markdown(f"**Postcode Index:** {index_stats['postcodes']} postcodes, {index_stats['hits']} hits / {index_stats['misses']} misses ({index_stats['hit_rate']:.0%})")
+    route_stats = get_route_cache().stats()
+    st.sidebar.markdown(f"**Route Cache:** {route_stats['hits']} hits / {route_stats['misses']} misses ({route_stats['hit_rate']:.0%})")
 
 else:
     authorization_url, state = oauth.create_authorization_url(authorize_url, scope='openid email profile')
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from cache import open_geocode_cache, open_route_cache
+from fake_gmaps import FakeClient
+from fetcher import ApiFetcher
+from incremental import update_scores
+from metrics import RunMetrics
+from planner import generate_recommendations
+
+# Attendee counts benchmarked by default
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+# Default cost and emission factors (the app's sidebar defaults)
+FACTORS = (0.5, 0.2, 0.3, 0.1)
+
+# Allowed growth over a baseline report before a metric counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+# Metrics compared against a baseline: API calls must not grow at all, timings within the tolerance
+CALL_METRICS = ('api_calls',)
+TIME_METRICS = ('wall_seconds', 'scoring_seconds')
+
+
+# Function to build a synthetic attendee set: postcodes are shared (about one per three attendees)
+# with a skewed distribution, as in company-wide uploads where many people share offices
+def synthetic_attendees(num_attendees, seed=0):
+    rng = random.Random(seed)
+    num_postcodes = max(1, num_attendees // 3)
+    postcodes = [f"B{i // 100 % 100:02d} {i % 10}X{chr(65 + i % 26)}" for i in range(num_postcodes)]
+    chosen = [postcodes[min(int(rng.paretovariate(1.2)) - 1, num_postcodes - 1)] if rng.random() < 0.3 else rng.choice(postcodes) for _ in range(num_attendees)]
+    groups = pd.Series(chosen).value_counts()
+    return pd.DataFrame({'postcode': groups.index, 'attendee_count': groups.to_numpy()})
+
+
+# Function to build a synthetic list of candidate venues, one per line like the sidebar input
+def synthetic_venues(num_venues):
+    return '\n'.join(f"Venue {i} City Centre" for i in range(num_venues))
+
+
+# Function to run the pipeline once against a fresh fake client; returns (result, messages, metrics, seconds, client, fetcher)
+def timed_run(postcode_groups, base_locations, prefilter_k, geocode_cache, route_cache, latency, error_rate, qps, workers, seed):
+    client = FakeClient(latency=latency, error_rate=error_rate, seed=seed)
+    fetcher = ApiFetcher(client, qps=qps, max_workers=workers)
+    messages = []
+    metrics = RunMetrics()
+    start = time.perf_counter()
+    result = generate_recommendations(
+        fetcher, postcode_groups, base_locations, *FACTORS, prefilter_k,
+        geocode_cache=geocode_cache, route_cache=route_cache, metrics=metrics, messages=messages
+    )
+    seconds = time.perf_counter() - start
+    fetcher.executor.shutdown()
+    return result, messages, metrics, seconds, client, fetcher
+
+
+# Function to benchmark one dataset size: a cold run on empty caches, then a warm rerun on the same caches.
+# Peak memory is measured on an extra warm run, since tracing allocations would distort the timings.
+def run_size(num_attendees, num_venues, prefilter_k, latency, error_rate, qps, workers, seed):
+    postcode_groups = synthetic_attendees(num_attendees, seed)
+    base_locations = synthetic_venues(num_venues)
+    report = {'attendees': num_attendees, 'unique_postcodes': len(postcode_groups), 'venues': num_venues}
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, 'bench_cache.sqlite3')
+        geocode_cache = open_geocode_cache(cache_path)
+        route_cache = open_route_cache(cache_path)
+        for phase in ('cold', 'warm'):
+            result, messages, metrics, wall_seconds, client, fetcher = timed_run(postcode_groups, base_locations, prefilter_k, geocode_cache, route_cache, latency, error_rate, qps, workers, seed)
+
+            run = result[4]
+            start = time.perf_counter()
+            if run.complete:
+                update_scores(None, run.origin_keys, run.weights, run.destinations, run.matrices, run.factors)
+            scoring_seconds = time.perf_counter() - start
+
+            progress = fetcher.progress()
+            report[phase] = {
+                'wall_seconds': round(wall_seconds, 4),
+                'scoring_seconds': round(scoring_seconds, 4),
+                'api_calls': progress['api_calls'],
+                'calls_by_endpoint': dict(client.calls),
+                'matrix_elements': client.elements,
+                'retries': progress['retried'],
+                'failed_calls': progress['failed'],
+                'errors': sum(1 for level, _ in messages if level == 'error'),
+                'top_location': result[0][0]['Location'] if result[0] else None,
+                'stages': metrics.to_dict(),
+            }
+
+        tracemalloc.start()
+        timed_run(postcode_groups, base_locations, prefilter_k, geocode_cache, route_cache, latency, error_rate, qps, workers, seed)
+        report['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        tracemalloc.stop()
+    return report
+
+
+# Function to list regressions of a report against a baseline report
+def find_regressions(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    baseline_sizes = {entry['attendees']: entry for entry in baseline['sizes']}
+    regressions = []
+    for entry in report['sizes']:
+        previous = baseline_sizes.get(entry['attendees'])
+        if previous is None:
+            continue
+        for phase in ('cold', 'warm'):
+            for metric in CALL_METRICS:
+                if entry[phase][metric] > previous[phase][metric]:
+                    regressions.append(f"{entry['attendees']} attendees ({phase}): {metric} {previous[phase][metric]} -> {entry[phase][metric]}")
+            for metric in TIME_METRICS:
+                if entry[phase][metric] > previous[phase][metric] * (1 + tolerance) + 0.01:
+                    regressions.append(f"{entry['attendees']} attendees ({phase}): {metric} {previous[phase][metric]} -> {entry[phase][metric]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline offline against a fake Google Maps backend.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Attendee counts to benchmark")
+    parser.add_argument('--venues', type=int, default=20, help="Number of candidate venues")
+    parser.add_argument('--prefilter-k', type=int, default=20, help="Candidate venues kept for routing")
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated seconds per API call")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of API calls failing with OVER_QUERY_LIMIT")
+    parser.add_argument('--qps', type=float, default=1000, help="Rate limit for the fetcher")
+    parser.add_argument('--workers', type=int, default=8, help="Fetcher worker threads")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    parser.add_argument('--baseline', help="Compare against an earlier JSON report and exit non-zero on regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="Allowed relative slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    report = {
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'sizes': [run_size(size, args.venues, args.prefilter_k, args.latency, args.error_rate, args.qps, args.workers, args.seed) for size in args.sizes],
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = find_regressions(report, json.load(f), args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Cache configuration, overridable through the environment
+CACHE_PATH = os.environ.get('EVENTS_CACHE_PATH', 'events_cache.sqlite3')
+GEOCODE_TTL_SECONDS = float(os.environ.get('EVENTS_GEOCODE_TTL_DAYS', 90)) * 24 * 3600
+GEOCODE_MAX_ENTRIES = int(os.environ.get('EVENTS_GEOCODE_MAX_ENTRIES', 200000))
+ROUTE_TTL_SECONDS = float(os.environ.get('EVENTS_ROUTE_TTL_DAYS', 30)) * 24 * 3600
+ROUTE_MAX_ENTRIES = int(os.environ.get('EVENTS_ROUTE_MAX_ENTRIES', 2000000))
+MEMORY_ENTRIES = int(os.environ.get('EVENTS_CACHE_MEMORY_ENTRIES', 10000))
+
+# Number of writes between eviction passes on the disk table
+EVICT_INTERVAL = 500
+
+# Maximum number of keys per batched SELECT (stays under SQLite's bound parameter limit)
+LOOKUP_BATCH_SIZE = 500
+
+
+# Function to normalize a postcode or address so that spacing and case variants share a cache entry
+def normalize_location(location):
+    return ' '.join(str(location).upper().split())
+
+
+# Function to build the route cache key for a canonical origin, destination and travel mode.
+# Time-aware routes also carry their departure window's bucket label (see departure.py).
+def route_key(origin, destination, travel_mode, bucket=None):
+    mode = travel_mode if bucket is None else f"{travel_mode}@{bucket}"
+    return f"{mode}|{normalize_location(origin)}|{normalize_location(destination)}"
+
+
+# Disk-backed key/value cache (SQLite) with TTL, size-bounded eviction and an in-process LRU layer.
+# Values are stored as JSON, so None can be cached to remember negative lookups.
+class PersistentCache:
+    def __init__(self, path, table, ttl_seconds, max_entries, memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes_since_evict = 0
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT, created_at REAL, accessed_at REAL)')
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)')
+
+    # Function to remember a value in the in-process LRU layer
+    def remember(self, key, value, created_at):
+        self.memory[key] = (value, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    # Function to look up many keys at once; returns {key: value} for the keys that were found
+    def lookup_many(self, keys):
+        now = time.time()
+        found = {}
+        pending = []
+        keys = list(dict.fromkeys(keys))
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    value, created_at = self.memory[key]
+                    if now - created_at <= self.ttl_seconds:
+                        self.memory.move_to_end(key)
+                        found[key] = value
+                        continue
+                    del self.memory[key]
+                pending.append(key)
+            disk_hits = []
+            for start in range(0, len(pending), LOOKUP_BATCH_SIZE):
+                batch = pending[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.conn.execute(f'SELECT key, value, created_at FROM {self.table} WHERE key IN ({placeholders})', batch).fetchall()
+                for key, value, created_at in rows:
+                    if now - created_at <= self.ttl_seconds:
+                        found[key] = json.loads(value)
+                        self.remember(key, found[key], created_at)
+                        disk_hits.append((now, key))
+            if disk_hits:
+                with self.conn:
+                    self.conn.executemany(f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', disk_hits)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    # Function to store many key/value pairs in one transaction
+    def store_many(self, items):
+        if not items:
+            return
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    f'INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    [(key, json.dumps(value), now, now) for key, value in items.items()]
+                )
+            for key, value in items.items():
+                self.remember(key, value, now)
+            self.writes_since_evict += len(items)
+            if self.writes_since_evict >= EVICT_INTERVAL:
+                self.evict()
+
+    # Function to drop expired entries and trim the table to max_entries, least recently used first
+    def evict(self):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(f'DELETE FROM {self.table} WHERE created_at < ?', (now - self.ttl_seconds,))
+            count = self.conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(f'DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)', (count - self.max_entries,))
+        self.writes_since_evict = 0
+
+    # Function to report hit/miss counters for this process
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0,
+            'memory_entries': len(self.memory),
+        }
+
+
+# Function to open the geocode cache
+def open_geocode_cache(path=CACHE_PATH):
+    return PersistentCache(path, 'geocode', GEOCODE_TTL_SECONDS, GEOCODE_MAX_ENTRIES)
+
+
+# Function to open the route cache, shared by all sessions using the same cache file
+def open_route_cache(path=CACHE_PATH):
+    return PersistentCache(path, 'routes', ROUTE_TTL_SECONDS, ROUTE_MAX_ENTRIES)
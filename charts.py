@@ -0,0 +1,48 @@
+import io
+
+# Bar colours of the cost, emissions and time charts
+CHART_COLORS = ('skyblue', 'lightgreen', 'lightcoral')
+
+# Resolution of the rendered PNGs
+CHART_DPI = 100
+
+
+# Function to draw one metric's bars against its budget line on an axes
+def draw_budget_chart(ax, locations, values, budget, label, color):
+    ax.bar(locations, values, color=color, label=label)
+    ax.axhline(y=budget, color='red', linestyle='--', label=f'Budgeted {label}')
+    ax.set_ylabel(label)
+    ax.set_title(f'{label} vs Budget')
+    ax.legend()
+
+
+# Function to save a figure as PNG bytes
+def figure_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=CHART_DPI)
+    return buffer.getvalue()
+
+
+# Function to render the budget charts to PNG bytes. charts is a list of (label, values, budget) per metric.
+# Returns one PNG per metric, or a single small-multiples PNG with the metrics side by side when combined.
+# Figures are built with matplotlib's object API rather than pyplot, so nothing is kept in pyplot's global
+# figure registry and each figure is freed once rendered. matplotlib is imported on first use.
+def render_budget_charts(locations, charts, combined=False):
+    from matplotlib.figure import Figure
+
+    if combined:
+        fig = Figure(figsize=(4.5 * len(charts), 4.5))
+        axes = fig.subplots(1, len(charts), squeeze=False)[0]
+        for ax, (label, values, budget), color in zip(axes, charts, CHART_COLORS):
+            draw_budget_chart(ax, locations, values, budget, label, color)
+            ax.tick_params(axis='x', labelrotation=30)
+        fig.tight_layout()
+        return [figure_png(fig)]
+
+    images = []
+    for (label, values, budget), color in zip(charts, CHART_COLORS):
+        fig = Figure()
+        draw_budget_chart(fig.subplots(), locations, values, budget, label, color)
+        fig.tight_layout()
+        images.append(figure_png(fig))
+    return images
@@ -0,0 +1,262 @@
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cache import open_geocode_cache, open_route_cache
+from departure import DEFAULT_WEEKDAY, WEEKDAYS, parse_start_time, travel_window
+from fetcher import API_QPS, ApiFetcher, make_client
+from ingest import read_postcode_groups
+from metrics import RunMetrics
+from planner import generate_recommendations, plan_venues
+from postcode_index import open_postcode_index
+from prefilter import DEFAULT_CANDIDATES
+
+# Default cost and emission factors (the app's sidebar defaults)
+DEFAULT_FACTORS = {'cost_per_km_car': 0.5, 'emission_per_km_car': 0.2, 'cost_per_km_train': 0.3, 'emission_per_km_train': 0.1}
+
+# Largest request body accepted by the HTTP endpoint
+MAX_UPLOAD_BYTES = 50 * 2 ** 20
+
+# Fetcher and caches of this process, created once per process (batch worker or HTTP server)
+PIPELINE = {}
+
+
+# Function to set up this process's fetcher and caches. In batch mode every worker process has its own
+# fetcher, so the API rate limit is split between them; the SQLite caches are shared through the file.
+# With offline set, a fake Google Maps backend is used instead (see fake_gmaps.py) for dry runs, without
+# the caches so that fake results never end up in them.
+def init_pipeline(api_key, qps=API_QPS, offline=False):
+    if offline:
+        from fake_gmaps import FakeClient
+        PIPELINE['fetcher'] = ApiFetcher(FakeClient(latency=0), qps=qps)
+        PIPELINE['geocode_cache'] = PIPELINE['route_cache'] = None
+    else:
+        PIPELINE['fetcher'] = ApiFetcher(make_client(api_key), qps=qps)
+        PIPELINE['geocode_cache'] = open_geocode_cache()
+        PIPELINE['route_cache'] = open_route_cache()
+    PIPELINE['postcode_index'] = open_postcode_index()
+
+
+# Function to plan one event from an attendee CSV (path or file object) with this process's pipeline.
+# options holds base_locations, venues, objective, prefilter_k, the four cost/emission factors, and
+# event_weekday and event_start ("HH:MM", None for untimed routing). Returns a JSON-serializable report.
+def plan_event(source, options):
+    start = time.perf_counter()
+    attendees = read_postcode_groups(source)
+    report = {'file': source if isinstance(source, str) else None, 'rows': attendees['total_rows']}
+    if not attendees['has_postcode']:
+        report['messages'] = [('error', "The CSV file must contain a 'postcode' column.")]
+        return report
+    report['unique_postcodes'] = len(attendees['groups'])
+
+    metrics = RunMetrics()
+    messages = []
+    factors = [options[name] for name in DEFAULT_FACTORS]
+    caches = {name: PIPELINE[name] for name in ('geocode_cache', 'route_cache', 'postcode_index')}
+    caches['travel_window'] = event_window(options)
+    if options['venues'] > 1:
+        plans, assignments, lat_lng_mapping = plan_venues(
+            PIPELINE['fetcher'], attendees['groups'], options['base_locations'], options['venues'], *factors,
+            options['prefilter_k'], options['objective'], metrics=metrics, messages=messages, **caches
+        )
+        report['attendees'] = int(assignments['attendee_count'].sum())
+        report['venues'] = plans
+        report['assignments'] = json.loads(assignments.to_json(orient='records'))
+    else:
+        recommendations, num_attendees, best_emission_location, lat_lng_mapping, _ = generate_recommendations(
+            PIPELINE['fetcher'], attendees['groups'], options['base_locations'], *factors,
+            options['prefilter_k'], metrics=metrics, messages=messages, **caches
+        )
+        report['attendees'] = num_attendees
+        report['recommendations'] = recommendations
+        report['best_emission_location'] = best_emission_location
+    report['time_window'] = caches['travel_window'] and caches['travel_window']['bucket']
+    report['lat_lng'] = lat_lng_mapping
+    report['messages'] = messages
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    report['stages'] = metrics.to_dict()
+    return report
+
+
+# Function to build the routing window of the options' event start (None for untimed routing)
+def event_window(options):
+    if not options.get('event_start'):
+        return None
+    return travel_window(options['event_weekday'], parse_start_time(options['event_start']))
+
+
+# Function to expand the batch arguments into CSV paths (directories contribute their *.csv files)
+def find_event_files(paths):
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, '*.csv'))) if os.path.isdir(path) else [path])
+    return files
+
+
+# Function to plan every event file, in parallel worker processes when processes > 1.
+# Each report is written to output_dir as <file name>.json when given; returns the reports in file order.
+def run_batch(files, options, api_key, processes, output_dir=None, offline=False):
+    reports = {}
+
+    def finish(path, report):
+        reports[path] = report
+        if output_dir:
+            with open(os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + '.json'), 'w') as f:
+                json.dump(report, f, indent=2)
+        top = report.get('recommendations') or report.get('venues') or [{}]
+        print(f"{path}: {report.get('attendees', 0)} attendees, {report.get('seconds', 0)}s, top location {top[0].get('Location')}", file=sys.stderr)
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    if processes <= 1:
+        init_pipeline(api_key, offline=offline)
+        for path in files:
+            finish(path, plan_event(path, options))
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=init_pipeline, initargs=(api_key, API_QPS / processes, offline)) as executor:
+            futures = {executor.submit(plan_event, path, options): path for path in files}
+            for future in as_completed(futures):
+                try:
+                    report = future.result()
+                except Exception as e:
+                    report = {'file': futures[future], 'messages': [('error', f"Planning failed: {e}")]}
+                finish(futures[future], report)
+    return [reports[path] for path in files]
+
+
+# HTTP endpoint: POST /recommendations with the attendee CSV as the body; options go in the query string
+# (base_locations as repeated parameters, venues, objective, prefilter_k, the factors, event_weekday and event_start). GET /health for probes.
+class RecommendationHandler(BaseHTTPRequestHandler):
+    options = {}
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/recommendations':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length or length > MAX_UPLOAD_BYTES:
+            self.send_json(400, {'error': f"Send the attendee CSV as the request body (at most {MAX_UPLOAD_BYTES} bytes)."})
+            return
+        try:
+            options = parse_options(parse_qs(url.query), self.options)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        try:
+            report = plan_event(io.BytesIO(self.rfile.read(length)), options)
+        except Exception as e:
+            self.send_json(500, {'error': f"Planning failed: {e}"})
+            return
+        # A file that could not be planned at all (e.g. no postcode column) is the client's error
+        self.send_json(200 if 'attendees' in report else 400, report)
+
+
+# Function to merge query string parameters over the server's default options
+def parse_options(query, defaults):
+    options = dict(defaults)
+    if 'base_locations' in query:
+        options['base_locations'] = '\n'.join(query['base_locations'])
+    if 'objective' in query:
+        options['objective'] = query['objective'][-1]
+    for name in ('venues', 'prefilter_k'):
+        if name in query:
+            options[name] = int(query[name][-1])
+    for name in DEFAULT_FACTORS:
+        if name in query:
+            options[name] = float(query[name][-1])
+    for name in ('event_weekday', 'event_start'):
+        if name in query:
+            options[name] = query[name][-1]
+    if options['objective'] not in ('cost', 'emissions', 'time'):
+        raise ValueError("objective must be one of cost, emissions or time")
+    if options['event_weekday'] not in WEEKDAYS:
+        raise ValueError(f"event_weekday must be one of {', '.join(WEEKDAYS)}")
+    event_window(options)  # raises ValueError for a malformed event_start
+    return options
+
+
+# Function to serve the HTTP endpoint until interrupted; requests run on threads sharing one fetcher
+def serve(host, port, options, api_key, offline=False):
+    init_pipeline(api_key, offline=offline)
+    RecommendationHandler.options = options
+    server = ThreadingHTTPServer((host, port), RecommendationHandler)
+    print(f"Serving recommendations on http://{host}:{port}/recommendations", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan event locations without the web UI: batch over attendee CSV files, or serve an HTTP endpoint.")
+    parser.add_argument('--api-key', default=os.environ.get('GOOGLE_API_KEY'), help="Google API key (defaults to $GOOGLE_API_KEY)")
+    parser.add_argument('--offline', action='store_true', help="Use the fake Google Maps backend instead of the API, for dry runs")
+    parser.add_argument('--base-locations', help="File with candidate venues, one per line (default: the attendee locations)")
+    parser.add_argument('--venues', type=int, default=1, help="Number of regional venues to plan (1 recommends a single venue)")
+    parser.add_argument('--objective', choices=('cost', 'emissions', 'time'), default='cost', help="What attendees are assigned by when planning several venues")
+    parser.add_argument('--event-start', help="Event start time (HH:MM); routes are then timed for it on a typical weekday")
+    parser.add_argument('--event-weekday', choices=WEEKDAYS, default=DEFAULT_WEEKDAY, help="Typical weekday of the event, with --event-start")
+    parser.add_argument('--prefilter-k', type=int, default=DEFAULT_CANDIDATES, help="Candidate venues kept for route evaluation")
+    for name, value in DEFAULT_FACTORS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=float, default=value)
+    commands = parser.add_subparsers(dest='command', required=True)
+    batch = commands.add_parser('batch', help="Plan every attendee CSV file (or directory of them)")
+    batch.add_argument('paths', nargs='+')
+    batch.add_argument('--output', help="Directory to write one JSON report per file (default: all reports to stdout)")
+    batch.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="Files planned in parallel")
+    http = commands.add_parser('serve', help="Serve POST /recommendations")
+    http.add_argument('--host', default='127.0.0.1')
+    http.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    if not args.api_key and not args.offline:
+        parser.error("a Google API key is required (--api-key or $GOOGLE_API_KEY), or use --offline")
+    base_locations = ''
+    if args.base_locations:
+        with open(args.base_locations) as f:
+            base_locations = f.read()
+    if args.event_start:
+        try:
+            parse_start_time(args.event_start)
+        except ValueError:
+            parser.error("--event-start must be a time of day as HH:MM")
+    options = {'base_locations': base_locations, 'venues': args.venues, 'objective': args.objective, 'prefilter_k': args.prefilter_k, 'event_weekday': args.event_weekday, 'event_start': args.event_start}
+    options.update({name: getattr(args, name) for name in DEFAULT_FACTORS})
+
+    if args.command == 'serve':
+        serve(args.host, args.port, options, args.api_key, args.offline)
+        return 0
+    files = find_event_files(args.paths)
+    reports = run_batch(files, options, args.api_key, min(args.processes, max(1, len(files))), args.output, args.offline)
+    if not args.output:
+        print(json.dumps(reports, indent=2))
+    # Non-zero when any file could not be planned at all
+    return 1 if any('attendees' not in report for report in reports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
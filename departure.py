@@ -0,0 +1,53 @@
+import datetime
+import os
+from zoneinfo import ZoneInfo
+
+# Width of the time windows event start times are bucketed into, overridable through the environment.
+# Every event starting in the same window on the same weekday shares its routes (and route cache entries).
+TIME_WINDOW_MINUTES = int(os.environ.get('EVENTS_TIME_WINDOW_MINUTES', 30))
+
+# The Distance Matrix API only takes an arrival time for transit, so drivers are routed departing this
+# many minutes before the start of the window instead
+DRIVING_LEAD_MINUTES = int(os.environ.get('EVENTS_DRIVING_LEAD_MINUTES', 60))
+
+# Timezone event start times are given in; the API takes absolute times, so they must not depend on the server's zone
+EVENT_TIMEZONE = ZoneInfo(os.environ.get('EVENTS_TIMEZONE', 'Europe/London'))
+
+# A departure time already in the past is moved to this many minutes from now (the API rejects past times)
+MIN_DEPARTURE_LEAD_MINUTES = 5
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+DEFAULT_WEEKDAY = 'Tuesday'
+
+
+# Function to bucket an event start (weekday name and datetime.time, in EVENT_TIMEZONE) into a routing window.
+# Routes are requested for the next occurrence of that weekday (the API needs a future time), at the start of
+# the window containing the event start, so results reflect a typical weekday at that time of day.
+# Returns {'bucket': label shared by all starts in the window, 'arrival_time', 'departure_time'}, as aware datetimes.
+def travel_window(weekday, start_time, window_minutes=TIME_WINDOW_MINUTES, now=None):
+    now = now or datetime.datetime.now(EVENT_TIMEZONE)
+    today = now.date()
+    minutes = (start_time.hour * 60 + start_time.minute) // window_minutes * window_minutes
+    days_ahead = (WEEKDAYS.index(weekday) - today.weekday() - 1) % 7 + 1
+    arrival_time = datetime.datetime.combine(today + datetime.timedelta(days=days_ahead), datetime.time(minutes // 60, minutes % 60), tzinfo=EVENT_TIMEZONE)
+    # Shortly after midnight, departing ahead of the window can fall before now when the event is tomorrow
+    departure_time = max(arrival_time - datetime.timedelta(minutes=DRIVING_LEAD_MINUTES), now + datetime.timedelta(minutes=MIN_DEPARTURE_LEAD_MINUTES))
+    return {
+        'bucket': f"{weekday[:3].lower()}-{minutes // 60:02d}{minutes % 60:02d}-{window_minutes}m",
+        'arrival_time': arrival_time,
+        'departure_time': departure_time,
+    }
+
+
+# Function to parse "HH:MM" into a datetime.time
+def parse_start_time(text):
+    return datetime.datetime.strptime(text.strip(), '%H:%M').time()
+
+
+# Function to get the Distance Matrix arguments that time a request for a travel mode (none without a window)
+def request_times(travel_mode, window):
+    if window is None:
+        return {}
+    if travel_mode == 'transit':
+        return {'arrival_time': window['arrival_time']}
+    return {'departure_time': window['departure_time']}
@@ -0,0 +1,134 @@
+import numpy as np
+
+from cache import route_key
+from departure import request_times
+
+# Distance Matrix API limits for a single request
+MAX_ORIGINS_PER_REQUEST = 25
+MAX_DESTINATIONS_PER_REQUEST = 25
+MAX_ELEMENTS_PER_REQUEST = 100
+
+
+# Function to split an origins x destinations grid into blocks that fit the API element limits
+def matrix_blocks(num_origins, num_destinations):
+    if num_origins == 0 or num_destinations == 0:
+        return []
+    destination_step = min(num_destinations, MAX_DESTINATIONS_PER_REQUEST, MAX_ELEMENTS_PER_REQUEST)
+    origin_step = max(1, min(MAX_ORIGINS_PER_REQUEST, MAX_ELEMENTS_PER_REQUEST // destination_step))
+    blocks = []
+    for i in range(0, num_origins, origin_step):
+        for j in range(0, num_destinations, destination_step):
+            blocks.append((slice(i, min(i + origin_step, num_origins)), slice(j, min(j + destination_step, num_destinations))))
+    return blocks
+
+
+# Function to read one Distance Matrix response into distance (km) and time (minutes) blocks.
+# Driving requests with a departure time also report the duration in traffic, which is used when present.
+# Pairs without a route stay inf.
+def parse_matrix_response(response, num_origins, num_destinations):
+    distances = np.full((num_origins, num_destinations), np.inf)
+    times = np.full((num_origins, num_destinations), np.inf)
+    for i, row in enumerate(response.get('rows', [])):
+        for j, element in enumerate(row.get('elements', [])):
+            if element.get('status') == 'OK':
+                distances[i, j] = element['distance']['value'] / 1000  # in km
+                times[i, j] = element.get('duration_in_traffic', element['duration'])['value'] / 60  # in minutes
+    return distances, times
+
+
+# Function to map a list onto its unique values; returns (unique values, index of each item)
+def unique_with_index(items):
+    positions = {}
+    index = [positions.setdefault(item, len(positions)) for item in items]
+    return list(positions), np.array(index, dtype=int)
+
+
+# Function to plan the Distance Matrix requests for one travel mode, skipping pairs found in the route cache.
+# Duplicate origins/destinations are requested once and origins missing the same destinations are batched
+# together, so a newly added venue costs one column of requests. bucket labels time-aware routes in the cache.
+def plan_mode_requests(origins, destinations, travel_mode, cache, bucket=None):
+    unique_origins, origin_index = unique_with_index(origins)
+    unique_destinations, destination_index = unique_with_index(destinations)
+    distances = np.full((len(unique_origins), len(unique_destinations)), np.inf)
+    times = np.full((len(unique_origins), len(unique_destinations)), np.inf)
+    missing = np.ones((len(unique_origins), len(unique_destinations)), dtype=bool)
+
+    if cache is not None and missing.size:
+        keys = [[route_key(origin, destination, travel_mode, bucket) for destination in unique_destinations] for origin in unique_origins]
+        cached = cache.lookup_many(key for row in keys for key in row)
+        for i, row in enumerate(keys):
+            for j, key in enumerate(row):
+                if key in cached:
+                    missing[i, j] = False
+                    if cached[key] is not None:
+                        distances[i, j], times[i, j] = cached[key]
+
+    groups = {}
+    for i in range(len(unique_origins)):
+        columns = tuple(np.flatnonzero(missing[i]))
+        if columns:
+            groups.setdefault(columns, []).append(i)
+
+    blocks = []
+    for columns, rows in groups.items():
+        for origin_slice, destination_slice in matrix_blocks(len(rows), len(columns)):
+            blocks.append((rows[origin_slice], list(columns[destination_slice])))
+
+    plan = {
+        'origins': unique_origins,
+        'destinations': unique_destinations,
+        'origin_index': origin_index,
+        'destination_index': destination_index,
+        'distances': distances,
+        'times': times,
+    }
+    return plan, blocks
+
+
+# Function to fetch dense distance and time arrays (origins x destinations) for several travel modes.
+# All requests for all modes run concurrently through the fetcher. Pairs with no route are left as inf;
+# request failures are appended to errors when given and are never cached. stats, when given, is a Counter
+# that receives route cache hits/misses and requests per travel mode, and the fetcher's call counts.
+# window, from departure.travel_window, times the requests (arrive by its start for transit, depart ahead of
+# it for driving); routes are then cached per window bucket rather than per exact time.
+def fetch_mode_matrices(fetcher, origins, destinations, travel_modes=('driving', 'transit'), errors=None, cache=None, on_progress=None, stats=None, window=None):
+    bucket = window['bucket'] if window is not None else None
+    plans = {}
+    calls = []
+    call_targets = []
+    for travel_mode in travel_modes:
+        plan, blocks = plan_mode_requests(origins, destinations, travel_mode, cache, bucket)
+        plans[travel_mode] = plan
+        if stats is not None:
+            cache_misses = sum(len(rows) * len(columns) for rows, columns in blocks)
+            stats['cache_hits'] += plan['distances'].size - cache_misses if cache is not None else 0
+            stats['cache_misses'] += cache_misses
+            stats[f'{travel_mode}_requests'] += len(blocks)
+        for rows, columns in blocks:
+            calls.append((([plan['origins'][i] for i in rows], [plan['destinations'][j] for j in columns]), {'mode': travel_mode, **request_times(travel_mode, window)}))
+            call_targets.append((travel_mode, rows, columns))
+
+    fetched = {travel_mode: {} for travel_mode in travel_modes}
+    outcomes = fetcher.map('distance_matrix', calls, on_progress, stats) if calls else []
+    for (travel_mode, rows, columns), (response, error) in zip(call_targets, outcomes):
+        plan = plans[travel_mode]
+        if error is not None:
+            if errors is not None:
+                errors.append(f"Error calculating distances for {len(rows)} origins with mode {travel_mode}: {error}")
+            continue
+        block_distances, block_times = parse_matrix_response(response, len(rows), len(columns))
+        plan['distances'][np.ix_(rows, columns)] = block_distances
+        plan['times'][np.ix_(rows, columns)] = block_times
+        for i, origin in enumerate(rows):
+            for j, destination in enumerate(columns):
+                route = None if np.isinf(block_distances[i, j]) else [float(block_distances[i, j]), float(block_times[i, j])]
+                fetched[travel_mode][route_key(plan['origins'][origin], plan['destinations'][destination], travel_mode, bucket)] = route
+
+    matrices = {}
+    for travel_mode, plan in plans.items():
+        if cache is not None:
+            cache.store_many(fetched[travel_mode])
+        selector = np.ix_(plan['origin_index'], plan['destination_index'])
+        matrices[travel_mode] = (plan['distances'][selector], plan['times'][selector])
+    return matrices
+
@@ -0,0 +1,161 @@
+import numpy as np
+
+from prefilter import SHORTLIST_FACTOR, haversine_matrix, prefilter_candidates
+
+# Improvement rounds of the swap search; each round makes the single best venue swap
+MAX_SWAP_ROUNDS = 50
+
+# Swaps must improve the objective by more than this fraction to count, so rounding noise cannot cycle
+SWAP_TOLERANCE = 1e-9
+
+# Lloyd iterations when grouping attendees into regions
+GROUPING_ITERATIONS = 20
+
+# Per-pair metric minimized by each objective
+OBJECTIVES = ('cost', 'emissions', 'time')
+
+
+# Function to build the (attendees x venues) matrix of weighted per-pair objective values.
+# Unreachable pairs get a penalty larger than every reachable pair together, so an attendee is only
+# assigned to a venue they cannot reach when none of the chosen venues is reachable for them.
+def assignment_costs(metrics, weights, objective='cost'):
+    costs = np.asarray(weights, dtype=float)[:, None] * metrics[objective]
+    penalty = costs[metrics['reachable']].sum() + 1
+    return np.where(metrics['reachable'], costs, penalty)
+
+
+# Function to sum the cost of serving every attendee from its cheapest chosen venue
+def total_cost(costs, chosen):
+    return costs[:, chosen].min(axis=1).sum()
+
+
+# Function to pick k venues greedily, each time adding the venue that lowers the total cost the most
+def greedy_venues(costs, k):
+    best = np.full(len(costs), np.inf)
+    chosen = []
+    for _ in range(min(k, costs.shape[1])):
+        totals = np.minimum(best[:, None], costs).sum(axis=0)
+        totals[chosen] = np.inf
+        venue = int(np.argmin(totals))
+        chosen.append(venue)
+        best = np.minimum(best, costs[:, venue])
+    return chosen
+
+
+# Function to improve a set of chosen venues by swapping one chosen venue for an unchosen one (Teitz-Bart).
+# With each attendee's nearest and second-nearest chosen venue cached, all swaps out of one venue are
+# evaluated in a single pass over the matrix, so a round costs O(k * attendees * venues).
+def swap_venues(costs, chosen, max_rounds=MAX_SWAP_ROUNDS):
+    chosen = list(chosen)
+    if not chosen or len(chosen) >= costs.shape[1]:
+        return chosen
+    rows = np.arange(len(costs))
+    for _ in range(max_rounds):
+        current = costs[:, chosen]
+        ranked = np.argsort(current, axis=1)
+        nearest = ranked[:, 0]
+        first = current[rows, nearest]
+        second = current[rows, ranked[:, 1]] if len(chosen) > 1 else np.full(len(costs), np.inf)
+        best_total, best_swap = first.sum() * (1 - SWAP_TOLERANCE), None
+        for position in range(len(chosen)):
+            # Cost of each attendee once the venue at this position is closed, then with each candidate opened
+            without = np.where(nearest == position, second, first)
+            totals = np.minimum(without[:, None], costs).sum(axis=0)
+            totals[chosen] = np.inf
+            venue = int(np.argmin(totals))
+            if totals[venue] < best_total:
+                best_total, best_swap = totals[venue], (position, venue)
+        if best_swap is None:
+            break
+        chosen[best_swap[0]] = best_swap[1]
+    return chosen
+
+
+# Function to solve the k-venue facility location problem on a cost matrix (attendees x venues).
+# Runs the swap search from the greedy solution and, when given, from a warm start, and keeps the better one.
+# Returns (chosen venue indices, index into chosen of each attendee's assigned venue).
+def choose_venues(costs, k, warm_start=None):
+    starts = [greedy_venues(costs, k)]
+    if warm_start is not None and len(warm_start):
+        starts.append(list(warm_start)[:k])
+    chosen = min((swap_venues(costs, start) for start in starts), key=lambda venues: total_cost(costs, venues))
+    chosen = sorted(chosen)
+    return chosen, np.argmin(costs[:, chosen], axis=1)
+
+
+# Function to split attendees into k regions with weighted k-means on a local projection, in O(attendees * k).
+# Centres start at the heaviest attendee, then at the attendees farthest (by weight) from the centres so far.
+# Returns the region of each attendee.
+def group_attendees(points, weights, k, iterations=GROUPING_ITERATIONS):
+    weights = np.asarray(weights, dtype=float)
+    scale = np.array([1.0, np.cos(np.radians(np.average(points[:, 0], weights=weights)))])
+    projected = points * scale
+    centers = [projected[np.argmax(weights)]]
+    nearest = ((projected - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, min(k, len(points))):
+        index = np.argmax(weights * nearest)
+        centers.append(projected[index])
+        nearest = np.minimum(nearest, ((projected - projected[index]) ** 2).sum(axis=1))
+    centers = np.array(centers)
+    for _ in range(iterations):
+        groups = np.argmin(((projected[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+        updated = np.array([
+            np.average(projected[groups == group], axis=0, weights=weights[groups == group]) if np.any(groups == group) else centers[group]
+            for group in range(len(centers))
+        ])
+        if np.allclose(updated, centers):
+            break
+        centers = updated
+    return np.argmin(((projected[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+
+
+# Function to choose which candidate venues get full route evaluation in k-venue mode, without network access.
+# The candidates are first cut to about SHORTLIST_FACTOR * k * per_group: attendees are grouped into k regions
+# and prefilter_candidates picks each region's most promising candidates, without building any attendees x
+# candidates matrix. On that pool, the problem is solved on weighted straight-line distances; then, for each
+# approximate venue's group of attendees, about per_group of the candidates closest to that group are kept.
+# Returns (kept candidate indices in their original order, the approximate solution as positions within them).
+def shortlist_venues(attendee_points, candidate_points, k, per_group, weights, factors):
+    weights = np.asarray(weights, dtype=float)
+    pool = np.arange(len(candidate_points))
+    if len(pool) > SHORTLIST_FACTOR * k * per_group:
+        regions = group_attendees(attendee_points, weights, k)
+        pool = np.unique(np.concatenate([
+            prefilter_candidates(attendee_points[regions == region], candidate_points, SHORTLIST_FACTOR * per_group, *factors, weights[regions == region])
+            for region in np.unique(regions)
+        ]))
+
+    distances = weights[:, None] * haversine_matrix(attendee_points, candidate_points[pool])
+    approximate, groups = choose_venues(distances, k)
+    kept = set(approximate)
+    for group in range(len(approximate)):
+        group_sums = distances[groups == group].sum(axis=0)
+        kept.update(int(j) for j in np.argsort(group_sums, kind='stable')[:per_group])
+    kept = sorted(kept)
+    return pool[kept], [kept.index(venue) for venue in approximate]
+
+
+# Function to total the per-pair metrics of each chosen venue over the attendees assigned to it.
+# Returns one dict per chosen venue with its index, attendee count, totals, averages and assigned rows.
+def summarize_assignment(metrics, weights, chosen, assignment):
+    weights = np.asarray(weights, dtype=float)
+    summary = []
+    for position, venue in enumerate(chosen):
+        rows = np.flatnonzero(assignment == position)
+        attendees = weights[rows].sum()
+        totals = {
+            'total_cost': weights[rows] @ metrics['cost'][rows, venue],
+            'total_emissions': weights[rows] @ metrics['emissions'][rows, venue],
+            'total_time': weights[rows] @ metrics['time'][rows, venue],
+            'unreachable': weights[rows] @ ~metrics['reachable'][rows, venue],
+        }
+        summary.append({
+            'venue': venue,
+            'attendees': attendees,
+            'rows': rows,
+            **totals,
+            'avg_cost': totals['total_cost'] / attendees if attendees else 0,
+            'avg_emissions': totals['total_emissions'] / attendees if attendees else 0,
+            'avg_time': totals['total_time'] / attendees if attendees else 0,
+        })
+    return summary
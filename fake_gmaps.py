@@ -0,0 +1,114 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+from googlemaps import exceptions
+
+from cache import normalize_location
+from distance_matrix import MAX_DESTINATIONS_PER_REQUEST, MAX_ELEMENTS_PER_REQUEST, MAX_ORIGINS_PER_REQUEST
+
+# Bounding box (lat, lng) that fake addresses are spread over, roughly Great Britain
+LAT_RANGE = (50.2, 57.5)
+LNG_RANGE = (-5.5, 1.7)
+
+# Travel model: road/rail distance as a multiple of straight-line distance, and average speeds
+DETOUR = {'driving': 1.25, 'transit': 1.15}
+SPEED_KMH = {'driving': 55, 'transit': 70}
+TRANSIT_WAIT_MINUTES = 15
+
+# Share of transit pairs with no route
+TRANSIT_NO_ROUTE_RATE = 0.03
+
+# Driving requests departing in these hours report a duration in traffic this much longer
+PEAK_HOURS = (7, 8, 16, 17)
+PEAK_TRAFFIC_FACTOR = 1.4
+
+
+# Function to derive a stable fraction in [0, 1) from some text
+def stable_fraction(*parts):
+    digest = hashlib.md5('|'.join(parts).encode()).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+
+# Deterministic local stand-in for googlemaps.Client (geocode, directions and distance_matrix endpoints).
+# Every address maps to a fixed point, so runs are repeatable; latency and error injection are configurable,
+# and call counts are recorded per endpoint.
+class FakeClient:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.elements = 0
+
+    # Function to simulate a round trip: count the call, wait, and maybe fail with OVER_QUERY_LIMIT
+    def round_trip(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] += 1
+            delay = self.latency + self.random.random() * self.jitter
+            fail = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise exceptions._OverQueryLimit('OVER_QUERY_LIMIT', 'Injected error')
+
+    # Function to place an address at its fixed point
+    def locate(self, address):
+        key = normalize_location(address).replace(', UK', '')
+        return {
+            'lat': LAT_RANGE[0] + stable_fraction('lat', key) * (LAT_RANGE[1] - LAT_RANGE[0]),
+            'lng': LNG_RANGE[0] + stable_fraction('lng', key) * (LNG_RANGE[1] - LNG_RANGE[0]),
+        }
+
+    # Function to compute the (distance m, duration s) of a route, or None when there is none
+    def route(self, origin, destination, mode):
+        if mode == 'transit' and stable_fraction('transit', normalize_location(origin), normalize_location(destination)) < TRANSIT_NO_ROUTE_RATE:
+            return None
+        a, b = self.locate(origin), self.locate(destination)
+        lat_a, lat_b = math.radians(a['lat']), math.radians(b['lat'])
+        h = math.sin((lat_b - lat_a) / 2) ** 2 + math.cos(lat_a) * math.cos(lat_b) * math.sin(math.radians(b['lng'] - a['lng']) / 2) ** 2
+        km = 2 * 6371 * math.asin(math.sqrt(h)) * DETOUR.get(mode, 1.25)
+        minutes = km / SPEED_KMH.get(mode, 55) * 60 + (TRANSIT_WAIT_MINUTES if mode == 'transit' else 0)
+        return int(km * 1000), int(minutes * 60)
+
+    def geocode(self, address, **kwargs):
+        self.round_trip('geocode')
+        if normalize_location(address).startswith('INVALID'):
+            return []
+        return [{'formatted_address': f"{normalize_location(address)}, UK", 'geometry': {'location': self.locate(address)}}]
+
+    def directions(self, origin, destination, mode='driving', **kwargs):
+        self.round_trip('directions')
+        route = self.route(origin, destination, mode)
+        if route is None:
+            return []
+        return [{'legs': [{'distance': {'value': route[0]}, 'duration': {'value': route[1]}}]}]
+
+    def distance_matrix(self, origins, destinations, mode='driving', departure_time=None, **kwargs):
+        if len(origins) > MAX_ORIGINS_PER_REQUEST or len(destinations) > MAX_DESTINATIONS_PER_REQUEST or len(origins) * len(destinations) > MAX_ELEMENTS_PER_REQUEST:
+            raise exceptions.ApiError('MAX_ELEMENTS_EXCEEDED')
+        self.round_trip('distance_matrix')
+        with self.lock:
+            self.elements += len(origins) * len(destinations)
+        traffic_factor = None
+        if mode == 'driving' and departure_time is not None:
+            traffic_factor = PEAK_TRAFFIC_FACTOR if departure_time.hour in PEAK_HOURS else 1.0
+        rows = []
+        for origin in origins:
+            elements = []
+            for destination in destinations:
+                route = self.route(origin, destination, mode)
+                if route is None:
+                    elements.append({'status': 'ZERO_RESULTS'})
+                else:
+                    element = {'status': 'OK', 'distance': {'value': route[0]}, 'duration': {'value': route[1]}}
+                    if traffic_factor is not None:
+                        element['duration_in_traffic'] = {'value': int(route[1] * traffic_factor)}
+                    elements.append(element)
+            rows.append({'elements': elements})
+        return {'status': 'OK', 'rows': rows}
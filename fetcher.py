@@ -0,0 +1,160 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Fetch configuration, overridable through the environment (match EVENTS_API_QPS to the project's API quota)
+API_QPS = float(os.environ.get('EVENTS_API_QPS', 50))
+MAX_WORKERS = int(os.environ.get('EVENTS_API_WORKERS', 8))
+REQUEST_TIMEOUT = float(os.environ.get('EVENTS_API_TIMEOUT', 10))
+MAX_RETRIES = int(os.environ.get('EVENTS_API_RETRIES', 5))
+BACKOFF_BASE = 0.5  # seconds, doubled on every retry
+BACKOFF_MAX = 16
+
+# API statuses worth retrying with backoff
+RETRIABLE_STATUSES = ('OVER_QUERY_LIMIT', 'UNKNOWN_ERROR')
+
+
+# Token-bucket rate limiter shared by all worker threads
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Function to block until a token is available
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+# Function to decide whether a failed API call is transient and worth retrying
+def is_retriable(error):
+    from googlemaps import exceptions
+
+    if isinstance(error, (exceptions._OverQueryLimit, exceptions.Timeout, exceptions.TransportError)):
+        return True
+    if isinstance(error, exceptions.ApiError):
+        return error.status in RETRIABLE_STATUSES
+    if isinstance(error, exceptions.HTTPError):
+        return error.status_code >= 500
+    return False
+
+
+# Function to create one Google Maps client with a connection pool sized for the worker threads
+# googlemaps and requests are imported lazily (here and in is_retriable, which only runs on failures),
+# so importing the pipeline does not load them until a client is actually needed
+def make_client(api_key, timeout=REQUEST_TIMEOUT, max_workers=MAX_WORKERS):
+    import googlemaps
+    from requests.adapters import HTTPAdapter
+
+    # Retries and throttling are handled by ApiFetcher, so the client's own are switched off. The client
+    # always retries 5xx responses itself until retry_timeout (60 s by default) and then raises Timeout;
+    # capping that at timeout keeps one attempt to about one request timeout before ApiFetcher backs off.
+    # The client throttles to the smaller of its per-second and per-minute quotas, so both are raised.
+    client = googlemaps.Client(key=api_key, timeout=timeout, retry_timeout=timeout, retry_over_query_limit=False, queries_per_second=10 ** 6, queries_per_minute=60 * 10 ** 6)
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    client.session.mount('https://', adapter)
+    return client
+
+
+# Concurrent fetch layer: runs client calls on a bounded thread pool behind a token-bucket rate limiter,
+# with exponential backoff on OVER_QUERY_LIMIT and transient errors, and in-flight/completed counters.
+class ApiFetcher:
+    def __init__(self, client, qps=API_QPS, max_workers=MAX_WORKERS, retries=MAX_RETRIES):
+        self.client = client
+        self.limiter = TokenBucket(qps)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='api-fetch')
+        self.retries = retries
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.api_calls = 0
+
+    # Function to call one client method with rate limiting and retries (runs on a worker thread).
+    # stats, when given, is a Counter that also receives this call's api_calls/retries/failed counts.
+    def call(self, method, args, kwargs, stats=None):
+        with self.lock:
+            self.in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                self.limiter.acquire()
+                with self.lock:
+                    self.api_calls += 1
+                    if stats is not None:
+                        stats['api_calls'] += 1
+                try:
+                    return getattr(self.client, method)(*args, **kwargs)
+                except Exception as e:
+                    if attempt >= self.retries or not is_retriable(e):
+                        with self.lock:
+                            self.failed += 1
+                            if stats is not None:
+                                stats['failed'] += 1
+                        raise
+                    with self.lock:
+                        self.retried += 1
+                        if stats is not None:
+                            stats['retries'] += 1
+                    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+                    time.sleep(delay * (0.5 + random.random() / 2))
+                    attempt += 1
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    # Function to run many calls of one client method concurrently.
+    # calls is a list of (args, kwargs); returns a list of (result, error) in the same order.
+    # on_progress is invoked on the calling thread whenever calls finish, so it may update the UI or abort;
+    # it receives this batch's done/total counts along with the fetcher-wide counters.
+    # stats, when given, is a Counter that receives the batch's own api_calls/retries/failed counts.
+    def map(self, method, calls, on_progress=None, stats=None):
+        calls = list(calls)
+        with self.lock:
+            self.submitted += len(calls)
+        futures = [self.executor.submit(self.call, method, args, kwargs, stats) for args, kwargs in calls]
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if on_progress is not None:
+                    on_progress(dict(self.progress(), done=len(futures) - len(pending), total=len(futures)))
+        except BaseException:
+            # The caller gave up (e.g. the job was cancelled): drop calls that have not started yet
+            cancelled = sum(1 for future in pending if future.cancel())
+            with self.lock:
+                self.submitted -= cancelled
+            raise
+        outcomes = []
+        for future in futures:
+            error = future.exception()
+            outcomes.append((None, error) if error is not None else (future.result(), None))
+        return outcomes
+
+    # Function to report the fetch counters
+    def progress(self):
+        with self.lock:
+            return {
+                'submitted': self.submitted,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'retried': self.retried,
+                'api_calls': self.api_calls,
+            }
@@ -0,0 +1,47 @@
+from cache import normalize_location
+from postcode_index import postcode_location
+
+
+# Function to geocode many locations concurrently. Postcodes are resolved from the offline postcode index
+# when one is given, then from the geocode cache; Google is only called for the remaining misses.
+# Returns (formatted_address, lat_lng) per location, or (None, None) when it could not be geocoded.
+# Request failures are appended to errors when given and are never cached. stats, when given, is a Counter
+# that receives index hits, cache hits/misses and the fetcher's call counts.
+def geocode_locations(fetcher, locations, cache=None, errors=None, on_progress=None, postcode_index=None, stats=None):
+    keys = [normalize_location(location) for location in locations]
+    found = {}
+    if postcode_index is not None:
+        for location, key in zip(locations, keys):
+            if key not in found:
+                lat_lng = postcode_index.lookup(location)
+                if lat_lng is not None:
+                    found[key] = postcode_location(location, lat_lng)
+    index_hits = len(found)
+    if cache is not None:
+        found.update(cache.lookup_many(key for key in keys if key not in found))
+
+    pending = {}
+    for location, key in zip(locations, keys):
+        if key not in found:
+            pending.setdefault(key, location)
+
+    fetched = {}
+    if stats is not None:
+        stats['index_hits'] += index_hits
+        stats['cache_hits'] += len(found) - index_hits
+        stats['cache_misses'] += len(pending)
+    outcomes = fetcher.map('geocode', [((location,), {}) for location in pending.values()], on_progress, stats) if pending else []
+    for (key, location), (result, error) in zip(pending.items(), outcomes):
+        if error is not None:
+            if errors is not None:
+                errors.append(f"Error validating location {location}: {error}")
+            continue
+        if result:
+            fetched[key] = {'formatted_address': result[0]['formatted_address'], 'lat_lng': result[0]['geometry']['location']}
+        else:
+            fetched[key] = None
+    if cache is not None:
+        cache.store_many(fetched)
+    found.update(fetched)
+
+    return [(found[key]['formatted_address'], found[key]['lat_lng']) if found.get(key) else (None, None) for key in keys]
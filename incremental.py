@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from scoring import TOTAL_COLUMNS, score_venues, with_averages
+
+TRAVEL_MODES = ('driving', 'transit')
+
+
+# Per-pair route matrices and per-venue scores of a finished run, kept so that the next run of an
+# iterative planning session only fetches and scores the attendees and venues that were added.
+# origin_keys identify attendee rows as (postcode, geocoded address); destinations are venue addresses
+# and lat_lngs their coordinates. A run with failed route requests is not complete and must not be
+# reused, so that the next run retries those pairs. bucket is the departure window the routes were timed for.
+class IncrementalRun:
+    def __init__(self, origin_keys, weights, destinations, lat_lngs, matrices, factors, scores, complete=True, bucket=None):
+        self.origin_keys = list(origin_keys)
+        self.weights = np.asarray(weights, dtype=float)
+        self.destinations = list(destinations)
+        self.lat_lngs = list(lat_lngs)
+        self.matrices = matrices
+        self.factors = tuple(factors)
+        self.scores = scores
+        self.complete = complete
+        self.bucket = bucket
+
+
+# Function to split the new rows/columns into ones carried over from the previous run and added ones.
+# Returns (kept new indices, matching previous indices, added new indices).
+def diff_positions(previous_items, items):
+    previous_positions = {item: i for i, item in enumerate(previous_items)}
+    kept = [i for i, item in enumerate(items) if item in previous_positions]
+    added = [i for i, item in enumerate(items) if item not in previous_positions]
+    return kept, [previous_positions[items[i]] for i in kept], added
+
+
+# Function to build the route matrices for a new attendee/venue set, reusing the previous run's pairs.
+# fetch(origins, destinations) must return {travel mode: (distances, times)}.
+# Only added rows (against all venues) and added columns (against kept attendees) are fetched;
+# removed rows and columns are simply dropped. Returns (matrices, number of pairs fetched).
+def update_matrices(previous, origin_keys, destinations, fetch):
+    origins = [address for _, address in origin_keys]
+    if previous is None:
+        return fetch(origins, destinations), len(origins) * len(destinations)
+
+    kept_rows, previous_rows, added_rows = diff_positions(previous.origin_keys, origin_keys)
+    kept_columns, previous_columns, added_columns = diff_positions(previous.destinations, destinations)
+    shape = (len(origins), len(destinations))
+    matrices = {travel_mode: (np.full(shape, np.inf), np.full(shape, np.inf)) for travel_mode in TRAVEL_MODES}
+    for travel_mode, (distances, times) in matrices.items():
+        previous_distances, previous_times = previous.matrices[travel_mode]
+        distances[np.ix_(kept_rows, kept_columns)] = previous_distances[np.ix_(previous_rows, previous_columns)]
+        times[np.ix_(kept_rows, kept_columns)] = previous_times[np.ix_(previous_rows, previous_columns)]
+
+    fetched_pairs = 0
+    if added_rows and destinations:
+        fetched = fetch([origins[i] for i in added_rows], destinations)
+        for travel_mode, (distances, times) in matrices.items():
+            distances[added_rows, :], times[added_rows, :] = fetched[travel_mode]
+        fetched_pairs += len(added_rows) * len(destinations)
+    if kept_rows and added_columns:
+        fetched = fetch([origins[i] for i in kept_rows], [destinations[j] for j in added_columns])
+        for travel_mode, (distances, times) in matrices.items():
+            distances[np.ix_(kept_rows, added_columns)], times[np.ix_(kept_rows, added_columns)] = fetched[travel_mode]
+        fetched_pairs += len(kept_rows) * len(added_columns)
+    return matrices, fetched_pairs
+
+
+# Function to score a block of the matrices with the given weights
+def score_block(matrices, rows, columns, weights, factors):
+    car_distances, car_times = matrices['driving']
+    train_distances, train_times = matrices['transit']
+    block = np.ix_(rows, columns)
+    return score_venues(car_distances[block], car_times[block], train_distances[block], train_times[block], *factors, weights)[TOTAL_COLUMNS].to_numpy()
+
+
+# Function to score venues for the new attendee/venue set, updating the previous run's totals.
+# Scores are linear in attendee weights, so kept venues only need the contributions of added, removed
+# and re-weighted attendees; added venues are scored in full. Any change of cost or emission factors
+# invalidates the previous totals and everything is rescored.
+def update_scores(previous, origin_keys, weights, destinations, matrices, factors):
+    weights = np.asarray(weights, dtype=float)
+    all_rows = list(range(len(origin_keys)))
+    if previous is None or previous.factors != tuple(factors):
+        totals = score_block(matrices, all_rows, list(range(len(destinations))), weights, factors)
+        return with_averages(pd.DataFrame(totals, columns=TOTAL_COLUMNS), weights.sum())
+
+    kept_rows, previous_rows, added_rows = diff_positions(previous.origin_keys, origin_keys)
+    kept_columns, previous_columns, added_columns = diff_positions(previous.destinations, destinations)
+    totals = np.zeros((len(destinations), len(TOTAL_COLUMNS)))
+    totals[kept_columns] = previous.scores[TOTAL_COLUMNS].to_numpy()[previous_columns]
+
+    # Weight deltas for the new rows (added rows had weight 0 before)
+    deltas = weights.copy()
+    deltas[kept_rows] -= previous.weights[previous_rows]
+    changed_rows = [i for i in all_rows if deltas[i] != 0]
+    if changed_rows and kept_columns:
+        totals[kept_columns] += score_block(matrices, changed_rows, kept_columns, deltas[changed_rows], factors)
+    removed_rows = sorted(set(range(len(previous.origin_keys))) - set(previous_rows))
+    if removed_rows and kept_columns:
+        totals[kept_columns] -= score_block(previous.matrices, removed_rows, previous_columns, previous.weights[removed_rows], factors)
+    if added_columns:
+        totals[added_columns] = score_block(matrices, all_rows, added_columns, weights, factors)
+    return with_averages(pd.DataFrame(totals, columns=TOTAL_COLUMNS), weights.sum())
@@ -0,0 +1,50 @@
+from collections import Counter
+
+import pandas as pd
+
+# Rows parsed per chunk when streaming an upload
+CHUNK_ROWS = 50000
+
+# Rows kept for the upload preview
+PREVIEW_ROWS = 20
+
+
+# Function to normalize a postcode: upper case with single spaces, and UK postcodes in their
+# standard "outward inward" form so that "sw1a1aa" and "SW1A  1AA" group together
+def normalize_postcode(postcode):
+    compact = ''.join(str(postcode).upper().split())
+    if 5 <= len(compact) <= 7 and compact[-3].isdigit() and compact[-2:].isalpha() and compact[0].isalpha():
+        return f"{compact[:-3]} {compact[-3:]}"
+    return ' '.join(str(postcode).upper().split())
+
+
+# Function to stream an attendee CSV in chunks and group it into unique postcodes with attendee counts.
+# Only the postcode counts and a bounded preview are kept in memory. Returns a dict with:
+#   'has_postcode': whether the file has a 'postcode' column
+#   'groups': DataFrame of (postcode, attendee_count), largest groups first
+#   'preview': the first PREVIEW_ROWS rows as uploaded
+#   'total_rows' / 'blank_rows': row counts, blank rows being those without a postcode
+def read_postcode_groups(file, chunksize=CHUNK_ROWS, preview_rows=PREVIEW_ROWS):
+    counts = Counter()
+    preview = None
+    total_rows = 0
+    blank_rows = 0
+    for chunk in pd.read_csv(file, chunksize=chunksize, dtype=str):
+        if preview is None:
+            preview = chunk.head(preview_rows)
+            if 'postcode' not in chunk.columns:
+                return {'has_postcode': False, 'groups': None, 'preview': preview, 'total_rows': 0, 'blank_rows': 0}
+        total_rows += len(chunk)
+        postcodes = chunk['postcode'].dropna().str.strip()
+        postcodes = postcodes[postcodes != '']
+        blank_rows += len(chunk) - len(postcodes)
+        counts.update(normalize_postcode(postcode) for postcode in postcodes)
+
+    groups = pd.DataFrame(counts.most_common(), columns=['postcode', 'attendee_count'])
+    return {
+        'has_postcode': preview is not None and 'postcode' in preview.columns,
+        'groups': groups,
+        'preview': preview if preview is not None else pd.DataFrame(),
+        'total_rows': total_rows,
+        'blank_rows': blank_rows,
+    }
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import RunMetrics
+
+# Job runner configuration, overridable through the environment
+JOB_WORKERS = int(os.environ.get('EVENTS_JOB_WORKERS', 2))
+MEMO_ENTRIES = int(os.environ.get('EVENTS_JOB_MEMO_ENTRIES', 64))
+
+# Memoized results expire after this long (well within the route cache TTL, so they never outlive their routes)
+MEMO_TTL_SECONDS = float(os.environ.get('EVENTS_JOB_MEMO_TTL_HOURS', 24)) * 3600
+
+# Finished jobs are forgotten after this many seconds (their results stay memoized)
+JOB_RETENTION_SECONDS = 3600
+
+
+# Raised inside a job's progress callback once cancellation has been requested
+class JobCancelled(Exception):
+    pass
+
+
+# Function to decide whether a finished run may be memoized: runs that reported errors (failed geocoding or
+# route requests) or whose IncrementalRun is incomplete are not, so running them again retries the failures
+def is_clean(result, messages):
+    if any(level == 'error' for level, _ in messages):
+        return False
+    run = result[-1] if isinstance(result, tuple) and result else None
+    return getattr(run, 'complete', True)
+
+
+# Function to hash the inputs of a run into a memo key
+def input_key(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        if hasattr(part, 'to_numpy'):
+            digest.update(part.to_csv(index=False).encode())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# One submitted run: status, current stage and fetch progress, messages and stage metrics so far, and the result
+class Job:
+    def __init__(self, key, attendees=0):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.attendees = attendees
+        self.status = 'queued'  # queued, running, done, failed or cancelled
+        self.stage = None
+        self.progress = None
+        self.messages = []
+        self.metrics = RunMetrics()
+        self.result = None
+        self.error = None
+        self.memoized = False
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    # Function passed to the pipeline as on_progress; also the point where cancellation takes effect
+    def report(self, stage, progress=None):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        self.stage = stage
+        self.progress = progress
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+
+# Runs recommendation jobs on a worker thread pool, shared by every session on the server.
+# Threads (not processes) are used because runs are I/O bound and share the fetcher and caches.
+# Clean completed results are memoized by input key for MEMO_TTL_SECONDS, and identical runs already in progress are shared.
+class JobManager:
+    def __init__(self, max_workers=JOB_WORKERS, memo_entries=MEMO_ENTRIES, metrics_store=None):
+        self.metrics_store = metrics_store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recommendation-job')
+        self.memo_entries = memo_entries
+        self.memo = OrderedDict()
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    # Function to submit fn(*args, metrics=..., messages=..., on_progress=..., **kwargs) under a memo key; returns the job id.
+    # attendees is the run's attendee count, recorded with its metrics.
+    def submit(self, key, fn, *args, attendees=0, **kwargs):
+        with self.lock:
+            self.forget_finished()
+            job = Job(key, attendees)
+            if key in self.memo and self.memo[key][2] < time.time() - MEMO_TTL_SECONDS:
+                del self.memo[key]
+            if key in self.memo:
+                self.memo.move_to_end(key)
+                job.result, job.messages, _ = self.memo[key]
+                job.status = 'done'
+                job.memoized = True
+                job.finished_at = time.time()
+                self.jobs[job.id] = job
+                return job.id
+            for running in self.jobs.values():
+                if running.key == key and not running.finished and not running.cancel_event.is_set():
+                    return running.id
+            self.jobs[job.id] = job
+        self.executor.submit(self.run, job, fn, args, kwargs)
+        return job.id
+
+    # Function to run one job on a worker thread
+    def run(self, job, fn, args, kwargs):
+        if job.cancel_event.is_set():
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            return
+        job.status = 'running'
+        try:
+            job.result = fn(*args, metrics=job.metrics, messages=job.messages, on_progress=job.report, **kwargs)
+            job.status = 'done'
+            if is_clean(job.result, job.messages):
+                with self.lock:
+                    self.memo[job.key] = (job.result, list(job.messages), time.time())
+                    self.memo.move_to_end(job.key)
+                    while len(self.memo) > self.memo_entries:
+                        self.memo.popitem(last=False)
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = e
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+        # Recorded here, once per executed run: memoized and shared jobs never get here a second time
+        if job.status == 'done' and self.metrics_store is not None:
+            self.metrics_store.append(job.attendees, job.metrics)
+
+    # Function to look up a job by id (None once it has been forgotten)
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    # Function to request cancellation; the job stops at its next progress report
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel_event.set()
+
+    # Function to drop finished jobs past their retention period (called with the lock held)
+    def forget_finished(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self.jobs[job_id]
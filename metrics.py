@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+# Metrics store location, overridable through the environment
+METRICS_PATH = os.environ.get('EVENTS_METRICS_PATH', 'events_metrics.sqlite3')
+
+# Percentiles reported in summaries, and how many recent runs they cover
+PERCENTILES = (50, 90, 99)
+SUMMARY_RUNS = 1000
+
+
+# Timings and counters for the stages of one recommendation run.
+# Each stage accumulates seconds plus a Counter that the pipeline fills in (API calls, retries, cache hits...).
+class RunMetrics:
+    def __init__(self):
+        self.stages = OrderedDict()
+        self.started_at = time.time()
+
+    # Function to get (creating if needed) the counters of a stage
+    def counters(self, name):
+        return self.stages.setdefault(name, {'seconds': 0.0, 'counters': Counter()})['counters']
+
+    # Context manager timing a stage; yields the stage's counters
+    @contextmanager
+    def stage(self, name):
+        counters = self.counters(name)
+        start = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            self.stages[name]['seconds'] += time.perf_counter() - start
+
+    # Function to record a stage timed elsewhere (e.g. a cached CSV parse)
+    def record(self, name, seconds, **counters):
+        self.counters(name).update(counters)
+        self.stages[name]['seconds'] += seconds
+
+    @property
+    def total_seconds(self):
+        return sum(stage['seconds'] for stage in self.stages.values())
+
+    # Function to flatten the stages into rows for display
+    def rows(self):
+        rows = []
+        for name, stage in self.stages.items():
+            counters = stage['counters']
+            lookups = counters['cache_hits'] + counters['cache_misses']
+            rows.append({
+                'Stage': name,
+                'Seconds': round(stage['seconds'], 3),
+                'API Calls': counters['api_calls'],
+                'Retries': counters['retries'],
+                'Cache Hit Rate': f"{counters['cache_hits'] / lookups:.0%}" if lookups else '-',
+                'Details': ', '.join(f"{key}={value}" for key, value in sorted(counters.items()) if key not in ('api_calls', 'retries', 'cache_hits', 'cache_misses')),
+            })
+        return rows
+
+    def to_dict(self):
+        return {name: {'seconds': stage['seconds'], **stage['counters']} for name, stage in self.stages.items()}
+
+
+# Append-only run metrics store in SQLite, safe for concurrent sessions and processes.
+# Pipeline runs go in runs; stages timed per page view (CSV parse, chart rendering) go in page_views,
+# so they are in the percentile summaries without counting as runs in the usage totals.
+class MetricsStore:
+    def __init__(self, path=METRICS_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY AUTOINCREMENT, recorded_at REAL, attendees INTEGER, total_seconds REAL, stages TEXT)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS page_views (id INTEGER PRIMARY KEY AUTOINCREMENT, recorded_at REAL, stages TEXT)')
+
+    # Function to append one run
+    def append(self, attendees, run_metrics):
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT INTO runs (recorded_at, attendees, total_seconds, stages) VALUES (?, ?, ?, ?)',
+                (time.time(), attendees, run_metrics.total_seconds, json.dumps(run_metrics.to_dict()))
+            )
+
+    # Function to append the stages of one page view
+    def append_page_view(self, run_metrics):
+        with self.lock, self.conn:
+            self.conn.execute('INSERT INTO page_views (recorded_at, stages) VALUES (?, ?)', (time.time(), json.dumps(run_metrics.to_dict())))
+
+    # Function to report usage totals across all recorded runs
+    def usage(self):
+        with self.lock:
+            count, attendees, total_seconds = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(attendees), 0), COALESCE(SUM(total_seconds), 0) FROM runs').fetchone()
+            last = self.conn.execute('SELECT total_seconds FROM runs ORDER BY id DESC LIMIT 1').fetchone()
+        return {
+            'usage_count': count,
+            'total_attendees': attendees,
+            'average_time': total_seconds / count if count else 0,
+            'last_processing_time': last[0] if last else 0,
+        }
+
+    # Function to summarize per-stage timing percentiles over the most recent runs and page views
+    def summary(self, limit=SUMMARY_RUNS):
+        with self.lock:
+            rows = self.conn.execute('SELECT total_seconds, stages FROM runs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+            page_views = self.conn.execute('SELECT stages FROM page_views ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        timings = {'Total': [total_seconds for total_seconds, _ in rows]}
+        for stages in [stages for _, stages in rows] + [stages for stages, in page_views]:
+            for name, stage in json.loads(stages).items():
+                timings.setdefault(name, []).append(stage['seconds'])
+        return [
+            {'Stage': name, 'Runs': len(values), **{f"p{p} (s)": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}}
+            for name, values in timings.items() if values
+        ]
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Objectives minimized by the optimizer, as totals for the event or averages per attendee
+TOTAL_OBJECTIVES = ['total_cost', 'total_emissions', 'total_time']
+AVERAGE_OBJECTIVES = ['avg_cost', 'avg_emissions', 'avg_time']
+
+# Budget handling modes
+CONSTRAINT_NONE = 'none'
+CONSTRAINT_SOFT = 'soft'
+CONSTRAINT_HARD = 'hard'
+
+# Weighted-score penalty per 100% of budget overshoot (soft constraints); scores are normalized to [0, 1]
+SOFT_PENALTY = 1.0
+
+
+# Function to find the non-dominated rows of an (n, k) array where every column is minimized.
+# Rows are sorted lexicographically first: a row can then only be dominated by rows before it, and only
+# the front found so far needs checking (a row dominated by a dominated row is dominated by the front too).
+# This is O(n log n + n * front size) instead of comparing every pair. Returns a boolean mask.
+def pareto_front(values):
+    values = np.asarray(values, dtype=float)
+    num_rows = len(values)
+    mask = np.zeros(num_rows, dtype=bool)
+    if num_rows == 0:
+        return mask
+    order = np.lexsort(values.T[::-1])
+    front = np.empty_like(values)
+    front_size = 0
+    for i in order:
+        row = values[i]
+        current = front[:front_size]
+        if front_size and np.any(np.all(current <= row, axis=1) & np.any(current < row, axis=1)):
+            continue
+        front[front_size] = row
+        front_size += 1
+        mask[i] = True
+    return mask
+
+
+# Function to compute how far each venue exceeds each budget, as a fraction of the budget (0 when within)
+def budget_overshoot(values, budgets):
+    budgets = np.asarray(budgets, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overshoot = np.where(budgets > 0, values / budgets - 1, np.where(values > budgets, np.inf, 0))
+    return np.maximum(overshoot, 0)
+
+
+# Function to scale each objective to [0, 1] across the venues (constant objectives become 0)
+def normalize(values):
+    low = values.min(axis=0)
+    span = values.max(axis=0) - low
+    return np.divide(values - low, span, out=np.zeros_like(values), where=span > 0)
+
+
+# Function to rank venues over cost, emissions and time.
+#   budgets: (cost, emissions, time) limits, compared with totals or, when average is True, per-attendee averages
+#   constraint: 'none', 'soft' (overshoot adds a penalty to the weighted score) or 'hard' (over-budget venues are excluded)
+#   weights: relative importance of (cost, emissions, time) in the weighted score
+# Venues are ordered Pareto-optimal first, then by weighted score, then by cost.
+# Returns (order, details): venue indices best first, and a frame with the Pareto flag, budget status and score per venue.
+def optimize_venues(scores, budgets, average=False, constraint=CONSTRAINT_SOFT, weights=(1, 1, 1), penalty=SOFT_PENALTY):
+    values = scores[AVERAGE_OBJECTIVES if average else TOTAL_OBJECTIVES].to_numpy(dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    weights = weights / weights.sum() if weights.sum() > 0 else np.full(len(weights), 1 / len(weights))
+
+    overshoot = budget_overshoot(values, budgets)
+    within_budget = ~np.any(overshoot > 0, axis=1)
+    weighted_score = normalize(values) @ weights if len(values) else np.zeros(0)
+    if constraint == CONSTRAINT_SOFT:
+        weighted_score = weighted_score + penalty * np.minimum(overshoot, 1e6).sum(axis=1)
+
+    pareto_optimal = pareto_front(values)
+    details = pd.DataFrame({
+        'pareto_optimal': pareto_optimal,
+        'within_budget': within_budget,
+        'budget_overshoot': overshoot.max(axis=1) if len(values) else np.zeros(0),
+        'weighted_score': weighted_score,
+    })
+    candidates = np.flatnonzero(within_budget) if constraint == CONSTRAINT_HARD else np.arange(len(values))
+    order = candidates[np.lexsort((values[candidates, 0], weighted_score[candidates], ~pareto_optimal[candidates]))]
+    return order, details
@@ -0,0 +1,218 @@
+import pandas as pd
+
+from distance_matrix import fetch_mode_matrices
+from facility import assignment_costs, choose_venues, shortlist_venues, summarize_assignment
+from geocode import geocode_locations
+from incremental import IncrementalRun, update_matrices, update_scores
+from metrics import RunMetrics
+from prefilter import DEFAULT_CANDIDATES, lat_lng_array, prefilter_candidates
+from scoring import best_emission_venue, pair_metrics, rank_venues
+
+
+# Function to format one scored venue for display
+def format_result(location, score):
+    total_time_hours, total_time_minutes = divmod(score['total_time'], 60)
+    return {
+        "Location": location.split(",")[0],  # Extracting city name
+        "Total Cost (£)": int(score['total_cost']),
+        "Total Emissions (kg CO2)": int(score['total_emissions']),
+        "Total Time": f"{int(total_time_hours)}h {int(total_time_minutes)}m",
+        "Avg Cost per Attendee (£)": int(score['avg_cost']),
+        "Avg Emissions per Attendee (kg CO2)": int(score['avg_emissions']),
+        "Avg Time per Attendee": f"{int(score['avg_time'] // 60)}h {int(score['avg_time'] % 60)}m",
+        # Numeric minutes for charts and machine consumers; the formatted fields above are for display
+        "Total Time (min)": int(score['total_time']),
+        "Avg Time per Attendee (min)": int(score['avg_time'])
+    }
+
+
+# Function to turn a venue ranking (indices into the run's venues, best first) into the displayed
+# recommendations: the top entries, the lowest-emission venue among the ranked ones, and their coordinates
+def rank_recommendations(run, order, count=3):
+    if len(order) == 0:
+        return [], None, {}
+    best_emission_index = best_emission_venue(run.scores, order)
+    results = [format_result(run.destinations[j], run.scores.iloc[j]) for j in order[:count]]
+    best_emission_location = format_result(run.destinations[best_emission_index], run.scores.iloc[best_emission_index])
+    lat_lng_mapping = {run.destinations[j].split(",")[0]: run.lat_lngs[j] for j in list(order[:count]) + [best_emission_index]}
+    return results, best_emission_location, lat_lng_mapping
+
+
+# Function to make the stage(name) helper used by the pipelines: it announces a stage to on_progress and
+# returns that stage's progress callback for the fetcher (None when nobody is listening)
+def progress_stages(on_progress):
+    def stage(name):
+        if on_progress is None:
+            return None
+        on_progress(name, None)
+        return lambda progress: on_progress(name, progress)
+    return stage
+
+
+# Function to geocode the attendee postcodes and the candidate venues, dropping those that cannot be located.
+# Geocoding and routing happen once per unique postcode; attendee counts weight the totals.
+# Returns (origin_keys, origin_lookups, attendee_counts, destination_lookups), venues deduplicated by address.
+def locate_inputs(fetcher, postcode_groups, base_locations, geocode_cache, postcode_index, metrics, messages, stage):
+    errors = []
+    origins = postcode_groups['postcode'].tolist()
+    with metrics.stage("Geocoding") as stats:
+        origin_lookups = geocode_locations(fetcher, origins, geocode_cache, errors, stage("Geocoding attendees"), postcode_index, stats)
+    messages.extend(('error', error) for error in errors)
+    valid_rows = [i for i, (address, _) in enumerate(origin_lookups) if address is not None]
+    if len(valid_rows) < len(origins):
+        messages.append(('warning', f"{len(origins) - len(valid_rows)} of {len(origins)} attendee postcodes could not be located and were left out."))
+    origin_lookups = [origin_lookups[i] for i in valid_rows]
+    attendee_counts = postcode_groups['attendee_count'].to_numpy()[valid_rows]
+    origin_keys = list(zip(postcode_groups['postcode'].to_numpy()[valid_rows], [address for address, _ in origin_lookups]))
+
+    if not base_locations.strip():
+        # If no base locations provided, use the already geocoded attendee locations as potential base locations
+        destination_lookups = origin_lookups
+    else:
+        errors = []
+        with metrics.stage("Geocoding") as stats:
+            destination_lookups = geocode_locations(fetcher, [line for line in base_locations.split('\n') if line.strip()], geocode_cache, errors, stage("Geocoding base locations"), postcode_index, stats)
+        messages.extend(('error', error) for error in errors)
+        located = [(address, lat_lng) for address, lat_lng in destination_lookups if address is not None]
+        if len(located) < len(destination_lookups):
+            messages.append(('warning', f"{len(destination_lookups) - len(located)} of {len(destination_lookups)} base locations could not be located and were left out."))
+        destination_lookups = located
+    return origin_keys, origin_lookups, attendee_counts, list(dict(destination_lookups).items())
+
+
+# Function to generate recommendations. It does not touch Streamlit, so it can run on a background worker:
+# messages collects (level, text) notes for the UI, and on_progress(stage, progress) is called as work
+# advances (progress is None at the start of a stage, then the fetcher counters while requests run).
+# Passing the IncrementalRun returned by the previous call limits routing and scoring to the attendees
+# and venues that changed since then. Stage timings and counters are recorded in metrics when given.
+# travel_window (see departure.travel_window) routes for the event's start time instead of departing now.
+# When nothing can be located, the recommendations are empty and the run is None.
+def generate_recommendations(fetcher, postcode_groups, base_locations, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, prefilter_k=DEFAULT_CANDIDATES, geocode_cache=None, route_cache=None, postcode_index=None, previous_run=None, travel_window=None, metrics=None, messages=None, on_progress=None):
+    messages = [] if messages is None else messages
+    metrics = RunMetrics() if metrics is None else metrics
+    errors = []
+    bucket = travel_window['bucket'] if travel_window is not None else None
+    if previous_run is not None and previous_run.bucket != bucket:
+        # Routes timed for another window cannot be carried over
+        previous_run = None
+    stage = progress_stages(on_progress)
+
+    def report_errors():
+        messages.extend(('error', error) for error in errors)
+        errors.clear()
+
+    origin_keys, origin_lookups, attendee_counts, destination_lookups = locate_inputs(fetcher, postcode_groups, base_locations, geocode_cache, postcode_index, metrics, messages, stage)
+    num_attendees = int(attendee_counts.sum())
+    if not origin_keys or not destination_lookups:
+        messages.append(('error', "No attendee or candidate location could be located."))
+        return [], num_attendees, None, {}, None
+
+    # Prune candidate venues on straight-line distance so only the most promising ones are routed
+    num_candidates = len(destination_lookups)
+    if num_candidates > prefilter_k:
+        with metrics.stage("Prefilter") as stats:
+            kept = prefilter_candidates(
+                lat_lng_array([lat_lng for _, lat_lng in origin_lookups]),
+                lat_lng_array([lat_lng for _, lat_lng in destination_lookups]),
+                prefilter_k, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, attendee_counts
+            )
+            stats['candidates'] += num_candidates
+            stats['kept'] += len(kept)
+        destination_lookups = [destination_lookups[j] for j in kept]
+        messages.append(('info', f"Prefilter kept {len(destination_lookups)} of {num_candidates} candidate locations (K = {prefilter_k}) for full route evaluation."))
+
+    valid_destinations = [address for address, _ in destination_lookups]
+
+    # Fetch each mode's distance/time matrix once and reuse it for mode selection and scoring;
+    # pairs already known from the previous run are carried over rather than fetched
+    routing_progress = stage("Routing")
+    with metrics.stage("Routing") as stats:
+        matrices, fetched_pairs = update_matrices(
+            previous_run, origin_keys, valid_destinations,
+            lambda origins, destinations: fetch_mode_matrices(fetcher, origins, destinations, ('driving', 'transit'), errors, route_cache, routing_progress, stats, travel_window)
+        )
+        stats['reused_pairs'] += len(origin_keys) * len(valid_destinations) - fetched_pairs if previous_run is not None else 0
+    routing_failed = bool(errors)
+    report_errors()
+    if previous_run is not None:
+        messages.append(('info', f"Incremental update: routed {fetched_pairs} new attendee/location combinations, reused {len(origin_keys) * len(valid_destinations) - fetched_pairs} from the previous run."))
+
+    stage("Scoring")
+    factors = (cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train)
+    with metrics.stage("Scoring"):
+        scores = update_scores(previous_run, origin_keys, attendee_counts, valid_destinations, matrices, factors)
+    run = IncrementalRun(origin_keys, attendee_counts, valid_destinations, [lat_lng for _, lat_lng in destination_lookups], matrices, factors, scores, complete=not routing_failed, bucket=bucket)
+    unreachable_pairs = int(scores['unreachable'].sum())
+    if unreachable_pairs:
+        messages.append(('error', f"No route found for {unreachable_pairs} attendee/location combinations; they were left out of the totals"))
+
+    results, best_emission_location, lat_lng_mapping = rank_recommendations(run, rank_venues(scores))
+    return results, num_attendees, best_emission_location, lat_lng_mapping, run
+
+
+# Function to format one venue of a k-venue plan for display; averages are over the attendees assigned to it
+def format_venue_plan(location, venue):
+    result = format_result(location, venue)
+    return {"Location": result.pop("Location"), "Attendees": int(venue['attendees']), **result}
+
+
+# Function to plan an event split over num_venues regional sessions, assigning every attendee to the venue
+# that is cheapest for them on the objective ('cost', 'emissions' or 'time', as in facility.OBJECTIVES).
+# Uses the same geocoding, routing and per-pair cost model as generate_recommendations. With more than
+# prefilter_k candidates, the problem is first solved on straight-line distances; that solution warm-starts
+# the search on routed costs, and only the candidates around its groups of attendees are routed.
+# Returns (venue plans, assignments frame of postcode, attendee_count and Location, lat_lng_mapping).
+def plan_venues(fetcher, postcode_groups, base_locations, num_venues, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, prefilter_k=DEFAULT_CANDIDATES, objective='cost', geocode_cache=None, route_cache=None, postcode_index=None, travel_window=None, metrics=None, messages=None, on_progress=None):
+    messages = [] if messages is None else messages
+    metrics = RunMetrics() if metrics is None else metrics
+    stage = progress_stages(on_progress)
+
+    origin_keys, origin_lookups, attendee_counts, destination_lookups = locate_inputs(fetcher, postcode_groups, base_locations, geocode_cache, postcode_index, metrics, messages, stage)
+    if not origin_keys or not destination_lookups:
+        messages.append(('error', "No attendee or candidate location could be located."))
+        return [], pd.DataFrame(columns=['postcode', 'attendee_count', 'Location']), {}
+    if num_venues >= len(destination_lookups):
+        messages.append(('warning', f"Only {len(destination_lookups)} candidate locations are available, so all of them are used."))
+
+    warm_start = None
+    num_candidates = len(destination_lookups)
+    if num_candidates > max(prefilter_k, num_venues):
+        with metrics.stage("Prefilter") as stats:
+            kept, warm_start = shortlist_venues(
+                lat_lng_array([lat_lng for _, lat_lng in origin_lookups]),
+                lat_lng_array([lat_lng for _, lat_lng in destination_lookups]),
+                num_venues, max(1, prefilter_k // num_venues), attendee_counts,
+                (cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train)
+            )
+            stats['candidates'] += num_candidates
+            stats['kept'] += len(kept)
+        destination_lookups = [destination_lookups[j] for j in kept]
+        messages.append(('info', f"Prefilter kept {len(destination_lookups)} of {num_candidates} candidate locations around {num_venues} regional groups for full route evaluation."))
+    destinations = [address for address, _ in destination_lookups]
+
+    errors = []
+    routing_progress = stage("Routing")
+    with metrics.stage("Routing") as stats:
+        matrices = fetch_mode_matrices(fetcher, [address for _, address in origin_keys], destinations, ('driving', 'transit'), errors, route_cache, routing_progress, stats, travel_window)
+    messages.extend(('error', error) for error in errors)
+
+    stage("Facility location")
+    with metrics.stage("Facility location") as stats:
+        car_distances, car_times = matrices['driving']
+        train_distances, train_times = matrices['transit']
+        pairs = pair_metrics(car_distances, car_times, train_distances, train_times, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train)
+        chosen, assignment = choose_venues(assignment_costs(pairs, attendee_counts, objective), num_venues, warm_start)
+        summary = summarize_assignment(pairs, attendee_counts, chosen, assignment)
+        stats['venues'] += len(chosen)
+    unreachable = int(sum(venue['unreachable'] for venue in summary))
+    if unreachable:
+        messages.append(('error', f"No route found for {unreachable} attendees to any chosen location; they were left out of the totals"))
+
+    plans = [format_venue_plan(destinations[venue['venue']], venue) for venue in summary]
+    assignments = pd.DataFrame({
+        'postcode': [postcode for postcode, _ in origin_keys],
+        'attendee_count': attendee_counts,
+        'Location': [plans[position]['Location'] for position in assignment],
+    })
+    lat_lng_mapping = {plan['Location']: destination_lookups[venue['venue']][1] for plan, venue in zip(plans, summary)}
+    return plans, assignments, lat_lng_mapping
@@ -0,0 +1,112 @@
+import argparse
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ingest import normalize_postcode
+
+# Location of the built index, overridable through the environment
+POSTCODE_INDEX_PATH = os.environ.get('EVENTS_POSTCODE_INDEX', 'postcode_index')
+
+# Accepted column names in the source CSV (ONSPD-style dumps use pcds/lat/long)
+POSTCODE_COLUMNS = ('postcode', 'pcds', 'pcd', 'pcd2')
+LAT_COLUMNS = ('lat', 'latitude')
+LNG_COLUMNS = ('lng', 'long', 'longitude')
+
+# Compact UK postcodes are at most 7 characters
+KEY_DTYPE = 'S8'
+
+CHUNK_ROWS = 200000
+
+
+# Function to turn a postcode into its index key: upper case with no spaces
+def postcode_key(postcode):
+    return ''.join(str(postcode).upper().split()).encode('ascii', 'ignore')[:8]
+
+
+# Function to pick the first matching column name from a header
+def find_column(columns, candidates):
+    lowered = {column.lower(): column for column in columns}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    raise ValueError(f"Source CSV needs one of the columns {', '.join(candidates)}")
+
+
+# Function to build the index from a postcode -> lat/lng CSV, as sorted arrays saved for memory mapping
+def build_postcode_index(source_csv, directory=POSTCODE_INDEX_PATH, chunksize=CHUNK_ROWS):
+    keys = []
+    coords = []
+    for chunk in pd.read_csv(source_csv, chunksize=chunksize, dtype=str):
+        postcode_column = find_column(chunk.columns, POSTCODE_COLUMNS)
+        lat = pd.to_numeric(chunk[find_column(chunk.columns, LAT_COLUMNS)], errors='coerce')
+        lng = pd.to_numeric(chunk[find_column(chunk.columns, LNG_COLUMNS)], errors='coerce')
+        # Terminated or unlocated postcodes carry placeholder coordinates outside the valid range
+        valid = chunk[postcode_column].notna() & lat.between(-90, 90) & lng.between(-180, 180)
+        keys.append(np.array([postcode_key(postcode) for postcode in chunk.loc[valid, postcode_column]], dtype=KEY_DTYPE))
+        coords.append(np.column_stack([lat[valid].to_numpy(), lng[valid].to_numpy()]))
+
+    keys = np.concatenate(keys) if keys else np.array([], dtype=KEY_DTYPE)
+    coords = np.concatenate(coords) if coords else np.empty((0, 2))
+    keys, first = np.unique(keys, return_index=True)
+    coords = coords[first]
+
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, 'keys.npy'), keys)
+    np.save(os.path.join(directory, 'coords.npy'), coords)
+    return len(keys)
+
+
+# Offline postcode centroid index: binary search over memory-mapped sorted keys
+class PostcodeIndex:
+    def __init__(self, directory=POSTCODE_INDEX_PATH):
+        self.keys = np.load(os.path.join(directory, 'keys.npy'), mmap_mode='r')
+        self.coords = np.load(os.path.join(directory, 'coords.npy'), mmap_mode='r')
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Function to look up a postcode; returns {'lat': ..., 'lng': ...} or None
+    def lookup(self, postcode):
+        key = postcode_key(postcode)
+        i = int(np.searchsorted(self.keys, key))
+        found = i < len(self.keys) and self.keys[i] == key
+        with self.lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not found:
+            return None
+        return {'lat': float(self.coords[i, 0]), 'lng': float(self.coords[i, 1])}
+
+    # Function to report hit/miss counters for this process
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'postcodes': len(self), 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0}
+
+
+# Function to open the index if it has been built, otherwise None
+def open_postcode_index(directory=POSTCODE_INDEX_PATH):
+    if not os.path.exists(os.path.join(directory, 'keys.npy')):
+        return None
+    return PostcodeIndex(directory)
+
+
+# Function to give an index hit the same shape as a geocode result
+def postcode_location(postcode, lat_lng):
+    return {'formatted_address': f"{normalize_postcode(postcode)}, UK", 'lat_lng': lat_lng}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the offline postcode centroid index from a postcode -> lat/lng CSV.")
+    parser.add_argument('source_csv', help="CSV with a postcode column (postcode/pcds/pcd) and lat/latitude and lng/long/longitude columns")
+    parser.add_argument('--output', default=POSTCODE_INDEX_PATH, help="Directory to write the index to")
+    args = parser.parse_args()
+    count = build_postcode_index(args.source_csv, args.output)
+    print(f"Indexed {count} postcodes in {args.output}")
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Straight-line distances are scaled by this factor to approximate road/rail distance
+DETOUR_FACTOR = 1.3
+
+# Default number of candidate venues kept for full route evaluation
+DEFAULT_CANDIDATES = int(os.environ.get('EVENTS_PREFILTER_K', 20))
+
+# Candidates nearest the attendees' geometric median that are always kept, on top of the top-K
+NEAR_MEDIAN_CANDIDATES = 3
+
+# With many candidates, only this multiple of K nearest the geometric median is scored
+SHORTLIST_FACTOR = 10
+
+# Attendee rows per block when accumulating distance sums, to bound memory
+CHUNK_ROWS = 2048
+
+
+# Function to turn a list of {'lat': ..., 'lng': ...} dicts into an (n, 2) array of degrees
+def lat_lng_array(lat_lngs):
+    return np.array([[lat_lng['lat'], lat_lng['lng']] for lat_lng in lat_lngs], dtype=float).reshape(-1, 2)
+
+
+# Function to compute the great-circle distance matrix (km) between two sets of (lat, lng) points
+def haversine_matrix(points_a, points_b):
+    lat_a, lng_a = np.radians(points_a[:, 0])[:, None], np.radians(points_a[:, 1])[:, None]
+    lat_b, lng_b = np.radians(points_b[:, 0])[None, :], np.radians(points_b[:, 1])[None, :]
+    a = np.sin((lat_b - lat_a) / 2) ** 2 + np.cos(lat_a) * np.cos(lat_b) * np.sin((lng_b - lng_a) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+# Function to find the weighted geometric median of (lat, lng) points (Weiszfeld's algorithm on a local projection)
+def geometric_median(points, weights=None, iterations=100, tolerance=1e-7):
+    weights = np.ones(len(points)) if weights is None else np.asarray(weights, dtype=float)
+    scale = np.array([1.0, np.cos(np.radians(np.average(points[:, 0], weights=weights)))])
+    projected = points * scale
+    median = np.average(projected, axis=0, weights=weights)
+    for _ in range(iterations):
+        distances = np.maximum(np.linalg.norm(projected - median, axis=1), 1e-12)
+        inverse = weights / distances
+        updated = (projected * inverse[:, None]).sum(axis=0) / inverse.sum()
+        if np.linalg.norm(updated - median) < tolerance:
+            median = updated
+            break
+        median = updated
+    return median / scale
+
+
+# Function to sum weighted straight-line distances (km) from all attendees to each candidate, in row blocks
+def weighted_distance_sums(attendee_points, candidate_points, weights):
+    sums = np.zeros(len(candidate_points))
+    for start in range(0, len(attendee_points), CHUNK_ROWS):
+        block = haversine_matrix(attendee_points[start:start + CHUNK_ROWS], candidate_points)
+        sums += weights[start:start + CHUNK_ROWS] @ block
+    return sums
+
+
+# Function to estimate total cost and emissions per candidate from straight-line distances, using the cheapest mode's factors
+def approximate_scores(attendee_points, candidate_points, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, weights=None):
+    weights = np.ones(len(attendee_points)) if weights is None else np.asarray(weights, dtype=float)
+    distance_sums = weighted_distance_sums(attendee_points, candidate_points, weights) * DETOUR_FACTOR
+    return distance_sums * min(cost_per_km_car, cost_per_km_train), distance_sums * min(emission_per_km_car, emission_per_km_train)
+
+
+# Function to choose which candidate venues get full route evaluation, without any network access.
+# Keeps the k candidates with the lowest approximate cost (then emissions), plus the few nearest the
+# attendees' geometric median. When there are many candidates, only the SHORTLIST_FACTOR * k nearest the
+# median are scored, keeping the work linear in attendees. This is a heuristic, not a bound: the median
+# minimizes total straight-line distance, but a candidate nearer to it does not necessarily have a lower
+# total (e.g. attendees spread along a line), so a good candidate outside that radius can be missed.
+# Returns the kept candidate indices in their original order.
+def prefilter_candidates(attendee_points, candidate_points, k, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, weights=None):
+    num_candidates = len(candidate_points)
+    if num_candidates <= k or len(attendee_points) == 0:
+        return np.arange(num_candidates)
+
+    median = geometric_median(attendee_points, weights)
+    distance_to_median = haversine_matrix(median[None, :], candidate_points)[0]
+    by_median = np.argsort(distance_to_median, kind='stable')
+    shortlist = np.sort(by_median[:SHORTLIST_FACTOR * k])
+
+    approx_cost, approx_emissions = approximate_scores(attendee_points, candidate_points[shortlist], cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, weights)
+    top_k = shortlist[np.lexsort((approx_emissions, approx_cost))[:k]]
+    return np.union1d(top_k, by_median[:NEAR_MEDIAN_CANDIDATES])
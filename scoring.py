@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+# Train is the default mode; car is used when the train takes more than this multiple of the car time
+TRAIN_TIME_FACTOR = 1.5
+
+# Score columns that are sums over attendees, so contributions can be added or removed incrementally
+TOTAL_COLUMNS = ['total_cost', 'total_emissions', 'total_time', 'unreachable']
+
+
+# Function to choose the travel mode for every attendee/venue pair; True where car travel is selected.
+# Same rules as before: train if both are unavailable or car is unavailable, car if train is unavailable
+# or takes more than TRAIN_TIME_FACTOR times the car time.
+def choose_car(car_times, train_times):
+    return np.isfinite(car_times) & (~np.isfinite(train_times) | (train_times > TRAIN_TIME_FACTOR * car_times))
+
+
+# Function to compute per-pair distance, time, cost and emissions (attendees x venues) for the chosen modes.
+# Pairs without a route in the chosen mode are marked unreachable and contribute nothing.
+def pair_metrics(car_distances, car_times, train_distances, train_times, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train):
+    use_car = choose_car(car_times, train_times)
+    distances = np.where(use_car, car_distances, train_distances)
+    times = np.where(use_car, car_times, train_times)
+    reachable = np.isfinite(distances) & np.isfinite(times)
+    distances = np.where(reachable, distances, 0.0)
+    times = np.where(reachable, times, 0.0)
+    return {
+        'use_car': use_car,
+        'reachable': reachable,
+        'distance': distances,
+        'time': times,
+        'cost': distances * np.where(use_car, cost_per_km_car, cost_per_km_train),
+        'emissions': distances * np.where(use_car, emission_per_km_car, emission_per_km_train),
+    }
+
+
+# Function to score every venue from precomputed distance/time arrays (attendees x venues), with no network access.
+# weights gives the number of attendees behind each row (defaults to one each).
+# Returns one row per venue with totals, per-attendee averages and the number of unreachable attendees.
+def score_venues(car_distances, car_times, train_distances, train_times, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train, weights=None):
+    metrics = pair_metrics(car_distances, car_times, train_distances, train_times, cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train)
+    num_rows, num_venues = metrics['cost'].shape
+    weights = np.ones(num_rows) if weights is None else np.asarray(weights, dtype=float)
+    num_attendees = weights.sum()
+
+    scores = pd.DataFrame({
+        'total_cost': weights @ metrics['cost'],
+        'total_emissions': weights @ metrics['emissions'],
+        'total_time': weights @ metrics['time'],
+        'unreachable': weights @ ~metrics['reachable'],
+    })
+    return with_averages(scores, num_attendees)
+
+
+# Function to (re)compute the per-attendee averages from the totals
+def with_averages(scores, num_attendees):
+    divisor = num_attendees if num_attendees else np.inf  # averages are 0 when there are no attendees
+    scores['avg_cost'] = scores['total_cost'] / divisor
+    scores['avg_emissions'] = scores['total_emissions'] / divisor
+    scores['avg_time'] = scores['total_time'] / divisor
+    return scores
+
+
+# Function to rank venues by total cost, then total emissions (whole units, as displayed); returns venue indices
+def rank_venues(scores):
+    return np.lexsort((np.trunc(scores['total_emissions'].to_numpy()), np.trunc(scores['total_cost'].to_numpy())))
+
+
+# Function to find the lowest-emission venue, breaking ties by rank; returns a venue index
+def best_emission_venue(scores, order):
+    emissions = np.trunc(scores['total_emissions'].to_numpy())[order]
+    return order[np.argmin(emissions)]
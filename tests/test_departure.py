@@ -0,0 +1,41 @@
+import datetime
+
+from departure import DRIVING_LEAD_MINUTES, EVENT_TIMEZONE, MIN_DEPARTURE_LEAD_MINUTES, parse_start_time, request_times, travel_window
+
+# A Wednesday in British Summer Time
+NOW = datetime.datetime(2024, 7, 10, 12, 0, tzinfo=EVENT_TIMEZONE)
+
+
+def test_travel_window_buckets_the_start_time():
+    assert travel_window('Tuesday', datetime.time(9, 0), 30, NOW)['bucket'] == 'tue-0900-30m'
+    assert travel_window('Tuesday', datetime.time(9, 29), 30, NOW)['bucket'] == 'tue-0900-30m'
+    assert travel_window('Tuesday', datetime.time(9, 30), 30, NOW)['bucket'] == 'tue-0930-30m'
+    assert travel_window('Friday', datetime.time(14, 10), 60, NOW)['bucket'] == 'fri-1400-60m'
+
+
+def test_travel_window_uses_the_next_occurrence_of_the_weekday():
+    assert travel_window('Thursday', datetime.time(9, 0), 30, NOW)['arrival_time'].date() == datetime.date(2024, 7, 11)
+    assert travel_window('Tuesday', datetime.time(9, 0), 30, NOW)['arrival_time'].date() == datetime.date(2024, 7, 16)
+    # The same weekday is a week ahead, never today
+    assert travel_window('Wednesday', datetime.time(18, 0), 30, NOW)['arrival_time'].date() == datetime.date(2024, 7, 17)
+
+
+def test_travel_window_is_in_the_event_timezone():
+    window = travel_window('Thursday', datetime.time(9, 0), 30, NOW)
+    # 09:00 British Summer Time is 08:00 UTC, whatever the server's own timezone
+    assert window['arrival_time'].astimezone(datetime.timezone.utc).hour == 8
+    assert window['arrival_time'] - window['departure_time'] == datetime.timedelta(minutes=DRIVING_LEAD_MINUTES)
+
+
+def test_travel_window_never_departs_in_the_past():
+    late_evening = datetime.datetime(2024, 7, 10, 23, 50, tzinfo=EVENT_TIMEZONE)
+    window = travel_window('Thursday', datetime.time(0, 15), 30, late_evening)
+    assert window['arrival_time'] == datetime.datetime(2024, 7, 11, 0, 0, tzinfo=EVENT_TIMEZONE)
+    assert window['departure_time'] == late_evening + datetime.timedelta(minutes=MIN_DEPARTURE_LEAD_MINUTES)
+
+
+def test_request_times_per_travel_mode():
+    window = travel_window('Thursday', parse_start_time(' 09:00 '), 30, NOW)
+    assert request_times('transit', window) == {'arrival_time': window['arrival_time']}
+    assert request_times('driving', window) == {'departure_time': window['departure_time']}
+    assert request_times('driving', None) == {}
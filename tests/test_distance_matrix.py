@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from cache import open_route_cache, route_key
+from distance_matrix import MAX_DESTINATIONS_PER_REQUEST, MAX_ELEMENTS_PER_REQUEST, MAX_ORIGINS_PER_REQUEST, fetch_mode_matrices, matrix_blocks, plan_mode_requests
+from fake_gmaps import FakeClient
+from fetcher import ApiFetcher
+
+
+@pytest.mark.parametrize('num_origins, num_destinations', [(1, 1), (3, 200), (200, 3), (30, 30), (101, 7), (4, 25), (5, 26)])
+def test_matrix_blocks_cover_the_grid_within_the_limits(num_origins, num_destinations):
+    covered = np.zeros((num_origins, num_destinations), dtype=int)
+    for rows, columns in matrix_blocks(num_origins, num_destinations):
+        num_rows, num_columns = rows.stop - rows.start, columns.stop - columns.start
+        assert num_rows <= MAX_ORIGINS_PER_REQUEST
+        assert num_columns <= MAX_DESTINATIONS_PER_REQUEST
+        assert num_rows * num_columns <= MAX_ELEMENTS_PER_REQUEST
+        covered[rows, columns] += 1
+    assert np.all(covered == 1)
+
+
+def test_matrix_blocks_use_full_requests():
+    # 10 destinations leave room for 10 origins per request
+    assert len(matrix_blocks(20, 10)) == 2
+    assert matrix_blocks(0, 5) == [] and matrix_blocks(5, 0) == []
+
+
+def test_fetch_mode_matrices_matches_single_routes():
+    client = FakeClient()
+    fetcher = ApiFetcher(client)
+    origins = [f"ORIGIN {i}" for i in range(30)] + ["ORIGIN 3"]
+    destinations = [f"VENUE {j}" for j in range(12)]
+    errors = []
+    matrices = fetch_mode_matrices(fetcher, origins, destinations, ('driving', 'transit'), errors)
+    assert errors == []
+    for mode, (distances, times) in matrices.items():
+        assert distances.shape == (31, 12)
+        for i, origin in enumerate(origins):
+            for j, destination in enumerate(destinations):
+                route = client.route(origin, destination, mode)
+                if route is None:
+                    assert np.isinf(distances[i, j]) and np.isinf(times[i, j])
+                else:
+                    assert distances[i, j] == pytest.approx(route[0] / 1000)
+                    assert times[i, j] == pytest.approx(route[1] / 60)
+    # The duplicated origin is routed once
+    assert client.elements == 2 * 30 * 12
+
+
+@pytest.fixture
+def route_cache(tmp_path):
+    return open_route_cache(str(tmp_path / 'cache.sqlite3'))
+
+
+def test_plan_mode_requests_skips_cached_and_negative_cached_pairs(route_cache):
+    route_cache.store_many({
+        route_key('A', 'X', 'driving'): [10.0, 12.0],
+        route_key('A', 'Y', 'driving'): None,  # known to have no route
+        route_key('B', 'X', 'driving'): [20.0, 25.0],
+        route_key('B', 'Y', 'transit'): [5.0, 6.0],  # other mode, not a hit
+    })
+    plan, blocks = plan_mode_requests(['A', 'B', 'a '], ['X', 'Y'], 'driving', route_cache)
+
+    # 'a ' differs from 'A' only in case and spacing, so it shares A's cache entries
+    assert plan['origins'] == ['A', 'B', 'a ']
+    assert plan['distances'][0].tolist() == plan['distances'][2].tolist() == [10.0, np.inf]
+    assert plan['times'][1, 0] == 25.0
+    requested = {(plan['origins'][i], plan['destinations'][j]) for rows, columns in blocks for i in rows for j in columns}
+    assert requested == {('B', 'Y')}
+
+
+def test_plan_mode_requests_dedups_and_groups_origins_by_missing_columns(route_cache):
+    origins = [f"O{i}" for i in range(6)]
+    destinations = ['X', 'Y', 'Z']
+    # Every origin already has X and Y cached; the new venue Z is missing for all of them
+    route_cache.store_many({route_key(o, d, 'driving'): [1.0, 1.0] for o in origins for d in ('X', 'Y')})
+    plan, blocks = plan_mode_requests(origins + origins[:2], destinations + ['X'], 'driving', route_cache)
+
+    assert len(plan['origins']) == 6 and len(plan['destinations']) == 3
+    assert plan['origin_index'].tolist() == [0, 1, 2, 3, 4, 5, 0, 1]
+    assert plan['destination_index'].tolist() == [0, 1, 2, 0]
+    # One request for the new column, covering every origin
+    assert blocks == [(list(range(6)), [2])]
+
+
+def test_plan_mode_requests_keeps_time_windows_apart(route_cache):
+    route_cache.store_many({route_key('A', 'X', 'driving', 'tue-0900-30m'): [1.0, 2.0]})
+    assert plan_mode_requests(['A'], ['X'], 'driving', route_cache, 'tue-0900-30m')[1] == []
+    assert plan_mode_requests(['A'], ['X'], 'driving', route_cache)[1] == [([0], [0])]
+    assert plan_mode_requests(['A'], ['X'], 'driving', route_cache, 'tue-0930-30m')[1] == [([0], [0])]
+
+
+def test_fetch_mode_matrices_caches_routes_and_misses(route_cache):
+    client = FakeClient()
+    fetcher = ApiFetcher(client)
+    origins = [f"ORIGIN {i}" for i in range(8)]
+    destinations = [f"VENUE {j}" for j in range(5)]
+    first = fetch_mode_matrices(fetcher, origins, destinations, ('driving', 'transit'), cache=route_cache)
+    requests = client.calls['distance_matrix']
+    second = fetch_mode_matrices(fetcher, origins, destinations, ('driving', 'transit'), cache=route_cache)
+    assert client.calls['distance_matrix'] == requests  # everything, including pairs without a route, came from the cache
+    for mode in first:
+        np.testing.assert_array_equal(first[mode][0], second[mode][0])
+        np.testing.assert_array_equal(first[mode][1], second[mode][1])
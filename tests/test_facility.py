@@ -0,0 +1,47 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from facility import choose_venues, group_attendees, shortlist_venues, total_cost
+
+
+def brute_force_cost(costs, k):
+    return min(total_cost(costs, list(chosen)) for chosen in itertools.combinations(range(costs.shape[1]), k))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_choose_venues_is_close_to_the_exact_optimum(seed):
+    rng = np.random.default_rng(seed)
+    costs = rng.uniform(1, 100, (25, 8))
+    chosen, assignment = choose_venues(costs, 3)
+    assert len(set(chosen)) == 3
+    np.testing.assert_array_equal(assignment, np.argmin(costs[:, chosen], axis=1))
+    assert total_cost(costs, chosen) <= brute_force_cost(costs, 3) * 1.05
+
+
+def test_choose_venues_finds_the_obvious_regions():
+    # Two clusters of attendees, each with one venue next to it and a far-away decoy
+    costs = np.array([[1.0, 50.0, 30.0], [2.0, 60.0, 30.0], [50.0, 1.0, 30.0], [60.0, 2.0, 30.0]])
+    chosen, assignment = choose_venues(costs, 2)
+    assert chosen == [0, 1]
+    assert assignment.tolist() == [0, 0, 1, 1]
+
+
+def test_group_attendees_splits_separated_clusters():
+    rng = np.random.default_rng(0)
+    points = np.vstack([rng.normal((51.5, -0.1), 0.05, (20, 2)), rng.normal((53.5, -2.2), 0.05, (20, 2))])
+    groups = group_attendees(points, np.ones(40), 2)
+    assert len(set(groups[:20])) == 1 and len(set(groups[20:])) == 1
+    assert groups[0] != groups[20]
+
+
+def test_shortlist_venues_keeps_the_approximate_solution():
+    rng = np.random.default_rng(1)
+    attendees = rng.uniform((50, -4), (55, 1), (200, 2))
+    candidates = rng.uniform((50, -4), (55, 1), (300, 2))
+    kept, approximate = shortlist_venues(attendees, candidates, 3, 4, np.ones(200), (0.5, 0.2, 0.3, 0.1))
+    assert np.all(np.diff(kept) > 0)
+    assert len(approximate) == 3
+    assert len(kept) < len(candidates)
+    assert all(0 <= position < len(kept) for position in approximate)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from incremental import TRAVEL_MODES, IncrementalRun, update_matrices, update_scores
+from scoring import TOTAL_COLUMNS
+
+FACTORS = (0.5, 0.2, 0.3, 0.1)
+
+
+# Fixture route "universe": fixed distances and times for every (origin, destination, mode), so a
+# matrix for any attendee/venue subset can be built or fetched consistently
+class RouteTable:
+    def __init__(self, num_origins, num_destinations, seed=0):
+        rng = np.random.default_rng(seed)
+        shape = (num_origins, num_destinations)
+        self.origins = [f"ORIGIN {i}" for i in range(num_origins)]
+        self.destinations = [f"VENUE {j}" for j in range(num_destinations)]
+        self.routes = {
+            'driving': (rng.uniform(1, 200, shape), np.where(rng.random(shape) < 0.1, np.inf, rng.uniform(5, 180, shape))),
+            'transit': (rng.uniform(1, 200, shape), np.where(rng.random(shape) < 0.2, np.inf, rng.uniform(5, 240, shape))),
+        }
+        self.fetched_pairs = 0
+
+    def matrices(self, origins, destinations):
+        rows = [self.origins.index(origin) for origin in origins]
+        columns = [self.destinations.index(destination) for destination in destinations]
+        block = np.ix_(rows, columns)
+        return {mode: (distances[block].copy(), times[block].copy()) for mode, (distances, times) in self.routes.items()}
+
+    def fetch(self, origins, destinations):
+        self.fetched_pairs += len(origins) * len(destinations)
+        return self.matrices(origins, destinations)
+
+
+def keys(table, rows):
+    return [(f"PC{i}", table.origins[i]) for i in rows]
+
+
+def make_run(table, rows, weights, columns, factors=FACTORS):
+    origin_keys = keys(table, rows)
+    destinations = [table.destinations[j] for j in columns]
+    matrices = table.matrices([address for _, address in origin_keys], destinations)
+    scores = update_scores(None, origin_keys, weights, destinations, matrices, factors)
+    return IncrementalRun(origin_keys, weights, destinations, [{'lat': 0, 'lng': 0}] * len(destinations), matrices, factors, scores)
+
+
+def test_update_matrices_fetches_only_added_pairs():
+    table = RouteTable(12, 6)
+    previous = make_run(table, range(8), np.ones(8), range(4))
+    rows, columns = [0, 2, 3, 5, 8, 9, 10], [1, 2, 3, 4, 5]  # attendees and venues added and removed
+    destinations = [table.destinations[j] for j in columns]
+    matrices, fetched_pairs = update_matrices(previous, keys(table, rows), destinations, table.fetch)
+
+    expected = table.matrices([table.origins[i] for i in rows], destinations)
+    for mode in TRAVEL_MODES:
+        np.testing.assert_array_equal(matrices[mode][0], expected[mode][0])
+        np.testing.assert_array_equal(matrices[mode][1], expected[mode][1])
+    # 3 added attendees x all 5 venues, plus 4 kept attendees x 2 added venues
+    assert fetched_pairs == table.fetched_pairs == 3 * 5 + 4 * 2
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_update_scores_matches_a_full_rescore(seed):
+    rng = np.random.default_rng(seed)
+    table = RouteTable(20, 8, seed)
+    previous_rows = sorted(rng.choice(20, 12, replace=False))
+    previous_columns = sorted(rng.choice(8, 5, replace=False))
+    previous = make_run(table, previous_rows, rng.integers(1, 5, 12).astype(float), previous_columns)
+
+    rows = sorted(rng.choice(20, 14, replace=False))
+    columns = sorted(rng.choice(8, 6, replace=False))
+    weights = rng.integers(1, 5, 14).astype(float)
+    origin_keys = keys(table, rows)
+    destinations = [table.destinations[j] for j in columns]
+    matrices = table.matrices([address for _, address in origin_keys], destinations)
+
+    incremental = update_scores(previous, origin_keys, weights, destinations, matrices, FACTORS)
+    full = update_scores(None, origin_keys, weights, destinations, matrices, FACTORS)
+    for column in TOTAL_COLUMNS + ['avg_cost', 'avg_emissions', 'avg_time']:
+        assert incremental[column].to_numpy() == pytest.approx(full[column].to_numpy())
+
+
+def test_update_scores_rescores_when_factors_change():
+    table = RouteTable(10, 4)
+    previous = make_run(table, range(10), np.ones(10), range(4), factors=(1.0, 1.0, 1.0, 1.0))
+    origin_keys = keys(table, range(10))
+    matrices = table.matrices(table.origins, table.destinations)
+    incremental = update_scores(previous, origin_keys, np.ones(10), table.destinations, matrices, FACTORS)
+    full = update_scores(None, origin_keys, np.ones(10), table.destinations, matrices, FACTORS)
+    assert incremental['total_cost'].to_numpy() == pytest.approx(full['total_cost'].to_numpy())
@@ -0,0 +1,23 @@
+from metrics import MetricsStore, RunMetrics
+
+
+def make_metrics(**stages):
+    metrics = RunMetrics()
+    for name, seconds in stages.items():
+        metrics.record(name, seconds)
+    return metrics
+
+
+def test_summary_includes_page_view_stages_without_counting_them_as_runs(tmp_path):
+    store = MetricsStore(str(tmp_path / 'metrics.sqlite3'))
+    store.append(10, make_metrics(Geocoding=1.0, Routing=2.0))
+    store.append(20, make_metrics(Geocoding=3.0, Routing=4.0))
+    store.append_page_view(make_metrics(**{'CSV parse': 0.1, 'Chart rendering': 0.5}))
+
+    summary = {row['Stage']: row for row in store.summary()}
+    assert summary['Total']['Runs'] == 2
+    assert summary['Routing']['p50 (s)'] == 3.0
+    assert summary['CSV parse']['Runs'] == 1
+    assert summary['Chart rendering']['p50 (s)'] == 0.5
+    assert store.usage()['usage_count'] == 2
+    assert store.usage()['total_attendees'] == 30
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from optimizer import CONSTRAINT_HARD, CONSTRAINT_NONE, CONSTRAINT_SOFT, optimize_venues, pareto_front
+
+
+# Pairwise definition: a row is on the front when no other row is at most as large everywhere and smaller somewhere
+def brute_force_front(values):
+    return np.array([
+        not any(np.all(other <= row) and np.any(other < row) for other in values)
+        for row in values
+    ])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_pareto_front_matches_pairwise_dominance(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 6, (60, 3)).astype(float)  # small integers, so ties and duplicates occur
+    assert pareto_front(values).tolist() == brute_force_front(values).tolist()
+
+
+def test_pareto_front_keeps_duplicates_and_handles_empty_input():
+    assert pareto_front([[1, 2], [1, 2], [2, 2]]).tolist() == [True, True, False]
+    assert pareto_front(np.zeros((0, 3))).tolist() == []
+
+
+@pytest.fixture
+def scores():
+    return pd.DataFrame({
+        'total_cost': [100.0, 80.0, 120.0, 90.0],
+        'total_emissions': [50.0, 70.0, 40.0, 45.0],
+        'total_time': [300.0, 280.0, 350.0, 310.0],
+    })
+
+
+def test_hard_budgets_exclude_over_budget_venues(scores):
+    order, details = optimize_venues(scores, (95, 60, 400), constraint=CONSTRAINT_HARD)
+    assert sorted(order.tolist()) == [3]
+    assert details['within_budget'].tolist() == [False, False, False, True]
+
+
+def test_soft_budgets_rank_every_venue_and_penalize_overshoot(scores):
+    budgets = (95, 60, 400)
+    order, details = optimize_venues(scores, budgets, constraint=CONSTRAINT_SOFT)
+    assert sorted(order.tolist()) == [0, 1, 2, 3]
+    assert order[0] == 3
+    plain = optimize_venues(scores, budgets, constraint=CONSTRAINT_NONE)[1]['weighted_score']
+    overshooting = ~details['within_budget'].to_numpy()
+    assert np.all(details['weighted_score'][overshooting] > plain[overshooting])
+    assert np.all(details['weighted_score'][~overshooting] == plain[~overshooting])
+
+
+def test_pareto_optimal_venues_rank_before_dominated_ones():
+    # D is dominated by C but has a lower weighted score than A and B
+    scores = pd.DataFrame({
+        'total_cost': [0.0, 10.0, 5.0, 6.0],
+        'total_emissions': [10.0, 0.0, 5.0, 6.0],
+        'total_time': [10.0, 10.0, 5.0, 6.0],
+    })
+    order, details = optimize_venues(scores, (100, 100, 100), constraint=CONSTRAINT_NONE)
+    assert details['pareto_optimal'].tolist() == [True, True, True, False]
+    assert details['weighted_score'][3] < details['weighted_score'][0]
+    assert order.tolist() == [2, 0, 1, 3]
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from scoring import TRAIN_TIME_FACTOR, choose_car, rank_venues, score_venues
+
+FACTORS = (0.5, 0.2, 0.3, 0.1)
+INF = np.inf
+
+
+# Per-pair rule of the original loop: train by default, car when train has no route or takes more than
+# TRAIN_TIME_FACTOR times the car time; pairs with no route in the chosen mode are skipped and counted
+def reference_scores(car_distances, car_times, train_distances, train_times, factors, weights):
+    cost_per_km_car, emission_per_km_car, cost_per_km_train, emission_per_km_train = factors
+    num_rows, num_venues = car_distances.shape
+    rows = []
+    for j in range(num_venues):
+        totals = {'total_cost': 0.0, 'total_emissions': 0.0, 'total_time': 0.0, 'unreachable': 0.0}
+        for i in range(num_rows):
+            car_available = np.isfinite(car_times[i, j])
+            train_available = np.isfinite(train_times[i, j])
+            use_car = car_available and (not train_available or train_times[i, j] > TRAIN_TIME_FACTOR * car_times[i, j])
+            distance, minutes = (car_distances[i, j], car_times[i, j]) if use_car else (train_distances[i, j], train_times[i, j])
+            if not (np.isfinite(distance) and np.isfinite(minutes)):
+                totals['unreachable'] += weights[i]
+                continue
+            totals['total_cost'] += weights[i] * distance * (cost_per_km_car if use_car else cost_per_km_train)
+            totals['total_emissions'] += weights[i] * distance * (emission_per_km_car if use_car else emission_per_km_train)
+            totals['total_time'] += weights[i] * minutes
+        rows.append(totals)
+    return rows
+
+
+# Fixture: 4 attendee rows x 3 venues covering train preferred, car faster, train missing, both missing
+@pytest.fixture
+def matrices():
+    car_distances = np.array([[10.0, 50.0, 30.0], [20.0, 5.0, INF], [40.0, 60.0, 80.0], [15.0, 25.0, 35.0]])
+    car_times = np.array([[15.0, 40.0, 30.0], [20.0, 8.0, INF], [35.0, 50.0, 70.0], [12.0, 22.0, 31.0]])
+    train_distances = np.array([[12.0, 55.0, 28.0], [INF, 6.0, 9.0], [38.0, INF, 75.0], [18.0, 24.0, 33.0]])
+    train_times = np.array([[20.0, 90.0, 25.0], [INF, 10.0, 14.0], [40.0, INF, 60.0], [30.0, 20.0, 47.0]])
+    return car_distances, car_times, train_distances, train_times
+
+
+def test_choose_car_follows_the_mode_rule():
+    car_times = np.array([10.0, 10.0, INF, 10.0, INF])
+    train_times = np.array([15.0, 15.1, 20.0, INF, INF])
+    assert choose_car(car_times, train_times).tolist() == [False, True, False, True, False]
+
+
+@pytest.mark.parametrize('weights', [None, np.array([1.0, 3.0, 2.0, 5.0])])
+def test_score_venues_matches_the_per_pair_rule(matrices, weights):
+    scores = score_venues(*matrices, *FACTORS, weights)
+    expected = reference_scores(*matrices, FACTORS, np.ones(4) if weights is None else weights)
+    for column in ('total_cost', 'total_emissions', 'total_time', 'unreachable'):
+        assert scores[column].to_numpy() == pytest.approx([row[column] for row in expected])
+    num_attendees = 4 if weights is None else weights.sum()
+    assert scores['avg_cost'].to_numpy() == pytest.approx(scores['total_cost'].to_numpy() / num_attendees)
+
+
+def test_score_venues_counts_unreachable_pairs(matrices):
+    car_distances, car_times, train_distances, train_times = matrices
+    car_times = car_times.copy()
+    car_times[1, 0] = INF  # row 1 has no train to venue 0 either
+    scores = score_venues(car_distances, car_times, train_distances, train_times, *FACTORS)
+    assert scores['unreachable'].tolist() == [1, 0, 0]
+
+
+def test_score_venues_matches_random_matrices():
+    rng = np.random.default_rng(0)
+    shape = (30, 7)
+    car_distances = rng.uniform(1, 200, shape)
+    car_times = np.where(rng.random(shape) < 0.1, INF, rng.uniform(5, 180, shape))
+    train_distances = rng.uniform(1, 200, shape)
+    train_times = np.where(rng.random(shape) < 0.2, INF, rng.uniform(5, 240, shape))
+    weights = rng.integers(1, 6, shape[0]).astype(float)
+    scores = score_venues(car_distances, car_times, train_distances, train_times, *FACTORS, weights)
+    expected = reference_scores(car_distances, car_times, train_distances, train_times, FACTORS, weights)
+    for column in ('total_cost', 'total_emissions', 'total_time', 'unreachable'):
+        assert scores[column].to_numpy() == pytest.approx([row[column] for row in expected])
+
+
+def test_rank_venues_orders_by_whole_cost_then_emissions(matrices):
+    scores = score_venues(*matrices, *FACTORS)
+    scores['total_cost'] = [100.4, 100.9, 50.0]
+    scores['total_emissions'] = [30.0, 20.0, 90.0]
+    assert rank_venues(scores).tolist() == [2, 1, 0]